@@ -7,6 +7,7 @@ import addonHandler
 import api
 import appModuleHandler
 import os
+import queueHandler
 import speech
 import sys
 import ui
@@ -19,16 +20,26 @@ from windowUtils import findDescendantWindow
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared"))
 from labelAutofinderCore import getLabel, SearchConfig, SearchDirections, refreshTextContent
-from radioBoss import apiUtils
+from radioBoss import LazyModule, profiler
 from radioBoss.configManager import addonConfig
 from radioBoss.constants import TrackDetails
-from radioBoss.trackInfoDialog import TrackInfoDialog
 del sys.path[0]
 del sys.modules["labelAutofinderCore"]
 del sys.modules["radioBoss"]
 
+# requests, asyncio and wx dialogs are loaded at the first API call or dialog
+apiUtils = LazyModule("apiUtils")
+trackInfoDialog = LazyModule("trackInfoDialog")
+searchDialog = LazyModule("searchDialog")
+
 addonHandler.initTranslation()
 
+def speakCorrection(msg):
+	# called from the API service thread when a cached answer turned out outdated
+	# Translators: spoken when the info just reported has changed
+	correction = _("Update: {msg}").format(msg=msg)
+	queueHandler.queueFunction(queueHandler.eventQueue, ui.message, correction)
+
 
 class BaseAppModule:
 
@@ -37,12 +48,14 @@ class BaseAppModule:
 		if not obj.name and obj.role == roles.SLIDER:
 			clsList.insert(0, SliderWithUnit)
 
+	@profiler.profiled
 	def event_foreground(self, obj, nextHandler):
 		# to fix text disappearing
 		if obj.role == roles.PANE:
 			refreshTextContent(obj)
 		nextHandler()
 
+	@profiler.profiled
 	def event_gainFocus(self, obj, nextHandler):
 		# avoid None obj
 		if not obj:
@@ -58,6 +71,7 @@ class BaseAppModule:
 			obj.name = getLabel(obj)
 		nextHandler()
 
+	@profiler.profiled
 	def event_focusEntered(self, obj, nextHandler):
 		# avoid None obj
 		if not obj:
@@ -91,20 +105,35 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 		pos = self.getTrackPos()
 		if not pos:
 			return
-		info = apiUtils.getPosTrackInfo(pos, detail)
+		# row text tells whether cached details are still valid
+		rowName = api.getFocusObject().name
+		info = apiUtils.getPosTrackInfo(pos, detail, rowName)
 		ui.message(info)
 
-	def getTrackPos(self):
-		curItem = api.getFocusObject()
-		if curItem.role != roles.TREEVIEWITEM and curItem.windowClassName != "TVirtualTreePlaylist":
-			ui.message(_("No playlist treeview found"))
-			return
+	@profiler.profiled
+	def event_gainFocus(self, obj, nextHandler):
+		super().event_gainFocus(obj, nextHandler)
+		# get details of nearby rows ready before they are asked
+		if obj and obj.role == roles.TREEVIEWITEM and obj.windowClassName == "TVirtualTreePlaylist":
+			pos = self.getRowPos(obj)
+			if pos:
+				apiUtils.prefetchAround(pos)
+
+	def getRowPos(self, obj):
 		pos = None
 		try:
-			posRow = curItem.name.split(";", 1)[0]
+			posRow = obj.name.split(";", 1)[0]
 			pos = int(posRow)
 		except:
 			pass
+		return pos
+
+	def getTrackPos(self):
+		curItem = api.getFocusObject()
+		if curItem.role != roles.TREEVIEWITEM and curItem.windowClassName != "TVirtualTreePlaylist":
+			ui.message(_("No playlist treeview found"))
+			return
+		pos = self.getRowPos(curItem)
 		if not pos:
 			info = _("Unable to get the track position from first column, please see documentation.")
 			ui.message(info)
@@ -130,16 +159,29 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 		pos = self.getTrackPos()
 		if not pos:
 			return
-		details = apiUtils.getFullPosTrackInfo(pos)
+		rowName = api.getFocusObject().name
+		details = apiUtils.getFullPosTrackInfo(pos, rowName)
 		if isinstance(details, str): # something went wrong
 			ui.message(details)
 			return
 		wx.CallAfter(
-			TrackInfoDialog.Run,
+			trackInfoDialog.TrackInfoDialog.Run,
 			title=_("Details of track {pos}").format(pos=pos),
 			details=details
 		)
 
+	@script(
+		# Translators: Message presented in input help mode.
+		description=_("Reports how long until the track at focused position in the playlist starts"),
+		speakOnDemand=True
+	)
+	def script_timeToPosTrack(self, gesture):
+		pos = self.getTrackPos()
+		if not pos:
+			return
+		info = apiUtils.getTimeToPosTrack(pos)
+		ui.message(info)
+
 	@classmethod
 	def addCurrentTrackDetailScript(cls, detail):
 		scriptSuffix = detail.title()
@@ -154,7 +196,7 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 		setattr(cls, funcName, script)
 
 	def reportCurrentTrackDetail(self, detail):
-		info = apiUtils.getCurrentTrackInfo(detail)
+		info = apiUtils.getCurrentTrackInfo(detail, onChange=speakCorrection)
 		ui.message(info)
 
 	@script(
@@ -196,7 +238,7 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 			ui.message(_("No current track"))
 			return
 		wx.CallAfter(
-			TrackInfoDialog.Run,
+			trackInfoDialog.TrackInfoDialog.Run,
 			title=_("Details of the current track"),
 			details=details
 		)
@@ -213,10 +255,7 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 			# Translators: error if summary of previous track is not available
 			ui.message(_("No previous track"))
 			return
-		msg = ""
-		for k, v in info.items():
-			tempMsg = "%s: %s; "%(k.title(), v)
-			msg = ''.join([msg, tempMsg])
+		msg = apiUtils.formatTrackSummary(info)
 		ui.message(msg)
 
 	@script(
@@ -226,15 +265,13 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 	)
 	def script_currentTrackSummary(self, gesture):
 		details = [detail.upper() for detail in addonConfig["infoSummary"]]
-		info = apiUtils.getPlaybackTrackInfo("current", details)
+		onChange = lambda info: speakCorrection(apiUtils.formatTrackSummary(info))
+		info = apiUtils.getPlaybackTrackInfo("current", details, onChange)
 		if isinstance(info, str) or not any(info.values()): # something went wrong
 			# Translators: error if summary of current track is not available
 			ui.message(_("No current track"))
 			return
-		msg = ""
-		for k, v in info.items():
-			tempMsg = "%s: %s; "%(k.title(), v)
-			msg = ''.join([msg, tempMsg])
+		msg = apiUtils.formatTrackSummary(info)
 		ui.message(msg)
 
 	@script(
@@ -249,10 +286,7 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 			# Translators: error if summary of next track is not available
 			ui.message(_("No next track"))
 			return
-		msg = ""
-		for k, v in info.items():
-			tempMsg = "%s: %s; "%(k.title(), v)
-			msg = ''.join([msg, tempMsg])
+		msg = apiUtils.formatTrackSummary(info)
 		ui.message(msg)
 
 	@script(
@@ -275,13 +309,51 @@ class AppModule(BaseAppModule, appModuleHandler.AppModule):
 		speakOnDemand=True
 	)
 	def script_jumpToPlaylist(self, gesture):
+		obj = self.getPlaylistTree()
+		if obj:
+			obj.setFocus()
+
+	def getPlaylistTree(self):
 		fg = api.getForegroundObject()
 		handle = findDescendantWindow(parent=fg.windowHandle, visible=True, controlID=0, className="TVirtualTreePlaylist")
 		if not handle:
 			ui.message(_("No playlist found"))
+			return None
+		return getNVDAObjectFromEvent(handle, 0, 0)
+
+	@script(
+		# Translators: Message presented in input help mode.
+		description=_("Searches the playlist by artist, title, album or tags, and moves to the chosen track"),
+		speakOnDemand=True
+	)
+	def script_searchPlaylist(self, gesture):
+		error = apiUtils.preparePlaylistSearch()
+		if error:
+			ui.message(error)
 			return
-		obj = getNVDAObjectFromEvent(handle, 0, 0)
-		obj.setFocus()
+		wx.CallAfter(
+			searchDialog.SearchDialog.Run,
+			# Translators: title of the playlist search dialog
+			title=_("Search in playlist"),
+			search=apiUtils.searchPlaylist,
+			onChoice=self.focusPlaylistRow
+		)
+
+	def focusPlaylistRow(self, pos):
+		tree = self.getPlaylistTree()
+		if not tree:
+			return
+		rows = tree.children
+		# rows are usually in position order, unless the playlist view is sorted otherwise
+		row = rows[pos-1] if 0 < pos <= len(rows) else None
+		if row is None or self.getRowPos(row) != pos:
+			row = next((row for row in rows if self.getRowPos(row) == pos), None)
+		if row is None:
+			# Translators: reported when the track chosen in the playlist search can't be focused
+			ui.message(_("Unable to move to track {pos}").format(pos=pos))
+			return
+		row.scrollIntoView()
+		row.setFocus()
 
 
 posRegister = AppModule.addPosTrackDetailScript
@@ -6,33 +6,94 @@
 import addonHandler
 import api
 import appModuleHandler
+import config
 import eventHandler
 import globalPluginHandler
 import globalVars
 import gui
 import os
+import queueHandler
+import socket
 import sys
 import ui
 import wx
 
 from ctypes import windll
+from functools import lru_cache
 from gui import guiHelper, nvdaControls, settingsDialogs
 from ipaddress import ip_address
+from logHandler import log
 from scriptHandler import script
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "shared"))
-from radioBoss import apiUtils, utils
+from radioBoss import LazyModule, metrics, profiler, utils
 from radioBoss.configManager import addonConfig
 from radioBoss.constants import TrackDetails
-from radioBoss.trackInfoDialog import TrackInfoDialog
 del sys.path[0]
 del sys.modules["radioBoss"]
 
+# requests, asyncio and wx dialogs are loaded at the first API call or dialog
+apiUtils = LazyModule("apiUtils")
+trackInfoDialog = LazyModule("trackInfoDialog")
+
 addonHandler.initTranslation()
 
+def speakCorrection(msg):
+	# called from the API service thread when a cached answer turned out outdated
+	# Translators: spoken when the info just reported has changed
+	correction = _("Update: {msg}").format(msg=msg)
+	queueHandler.queueFunction(queueHandler.eventQueue, ui.message, correction)
+
+def speakAnnouncement(msg):
+	# called from the API service thread when a new track starts
+	queueHandler.queueFunction(queueHandler.eventQueue, ui.message, msg)
+
+def getDiagnosticsText():
+	if not apiUtils.isLoaded():
+		# Translators: shown as diagnostics before any request to RadioBOSS
+		return _("No request made yet")
+	return "\n".join(apiUtils.getDiagnostics())
+
+def onProfileDone(capture):
+	# called on a thread of its own when the capture ends
+	try:
+		path = capture.save(globalVars.appArgs.configPath, getDiagnosticsText().splitlines())
+	except OSError:
+		log.error("RadioBOSS add-on profile not saved", exc_info=True)
+		return
+	finally:
+		metrics.configure(addonConfig["collectMetrics"])
+	log.info("RadioBOSS add-on profile saved to %s"%path)
+	# Translators: reported when a profile capture ends
+	speakAnnouncement(_("Profile saved to the NVDA configuration folder"))
+
+def isPollingWanted():
+	return addonConfig["backgroundPolling"] or addonConfig["announceTrackChange"]
+
 # to track and switch windows
 rbWindowHandle = lastWindowHandle = None
 
+@lru_cache(maxsize=8)
+def isLoopbackHost(host):
+	if host.lower() == "localhost":
+		return True
+	try:
+		return ip_address(host).is_loopback
+	except ValueError:
+		pass
+	# a name: resolved once, not at each poll
+	try:
+		addresses = socket.getaddrinfo(host, None)
+	except OSError:
+		return False
+	return bool(addresses) and all(ip_address(address[4][0].split("%")[0]).is_loopback for address in addresses)
+
+def isRadioBossRunning():
+	# a RadioBOSS on another machine can't be checked from here
+	if not isLoopbackHost(addonConfig["host"]):
+		return True
+	return any(app.appName == "radioboss" for app in list(appModuleHandler.runningTable.values()))
+
 
 class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 
@@ -46,12 +107,23 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			return
 		self.createMenu()
 		appModuleHandler.post_appSwitch.register(self.trackWindow)
+		config.post_configProfileSwitch.register(self.onConfigProfileSwitch)
+		if isPollingWanted():
+			apiUtils.startPolling(isRadioBossRunning, speakAnnouncement)
 
 	def createMenu(self):
 		gui.settingsDialogs.NVDASettingsDialog.categoryClasses.append(AddonSettings)
 
 	def terminate(self):
 		gui.settingsDialogs.NVDASettingsDialog.categoryClasses.remove(AddonSettings)
+		config.post_configProfileSwitch.unregister(self.onConfigProfileSwitch)
+		# nothing to close if no API call was ever made
+		if apiUtils.isLoaded():
+			apiUtils.terminate()
+
+	def onConfigProfileSwitch(self):
+		if apiUtils.isLoaded():
+			apiUtils.reloadConnection()
 
 	def trackWindow(self):
 		global rbWindowHandle, lastWindowHandle
@@ -61,6 +133,32 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		elif windll.user32.IsWindowVisible(obj.windowHandle) and obj.windowClassName != "WorkerW":  # exclude desktop, that causes problems
 			lastWindowHandle = obj.windowHandle
 
+	@script(
+		# Translators: Message presented in input help mode.
+		description=_("Writes API latency statistics and cache usage to the NVDA log"),
+	)
+	def script_logDiagnostics(self, gesture):
+		log.info("RadioBOSS add-on diagnostics:\n%s"%getDiagnosticsText())
+		# Translators: reported when diagnostics have been written to the log
+		ui.message(_("Diagnostics written to the NVDA log"))
+
+	@script(
+		# Translators: Message presented in input help mode.
+		description=_("Profiles the next add-on calls and events, saving the statistics to the NVDA configuration folder; pressed again, stops earlier"),
+	)
+	def script_captureProfile(self, gesture):
+		if globalVars.appArgs.secure:
+			return
+		if profiler.isCapturing():
+			profiler.stop()
+			return
+		calls = addonConfig["profileCalls"]
+		# request stages and counters go in the report too
+		metrics.configure(True)
+		profiler.start(calls, onProfileDone)
+		# Translators: reported when a profile capture starts
+		ui.message(_("Profiling the next {calls} add-on calls").format(calls=calls))
+
 	@script(
 		# Translators: Message presented in input help mode.
 		description=_("Switches between RadioBOSS and other windows where you are"),
@@ -95,7 +193,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 		setattr(cls, funcName, script)
 
 	def reportCurrentTrackDetail(self, detail):
-		info = apiUtils.getCurrentTrackInfo(detail)
+		info = apiUtils.getCurrentTrackInfo(detail, onChange=speakCorrection)
 		ui.message(info)
 
 	@script(
@@ -136,7 +234,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			ui.message(details)
 			return
 		wx.CallAfter(
-			TrackInfoDialog.Run,
+			trackInfoDialog.TrackInfoDialog.Run,
 			title=_("Details of the current track"),
 			details=details
 		)
@@ -153,10 +251,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			# Translators: error if summary of previous track is not available
 			ui.message(_("No previous track"))
 			return
-		msg = ""
-		for k, v in info.items():
-			tempMsg = "%s: %s; "%(k.title(), v)
-			msg = ''.join([msg, tempMsg])
+		msg = apiUtils.formatTrackSummary(info)
 		ui.message(msg)
 
 	@script(
@@ -166,15 +261,13 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 	)
 	def script_currentTrackSummary(self, gesture):
 		details = [detail.upper() for detail in addonConfig["infoSummary"]]
-		info = apiUtils.getPlaybackTrackInfo("current", details)
+		onChange = lambda info: speakCorrection(apiUtils.formatTrackSummary(info))
+		info = apiUtils.getPlaybackTrackInfo("current", details, onChange)
 		if isinstance(info, str) or not any(info.values()): # something went wrong
 			# Translators: error if summary of current track is not available
 			ui.message(_("No current track"))
 			return
-		msg = ""
-		for k, v in info.items():
-			tempMsg = "%s: %s; "%(k.title(), v)
-			msg = ''.join([msg, tempMsg])
+		msg = apiUtils.formatTrackSummary(info)
 		ui.message(msg)
 
 	@script(
@@ -189,10 +282,7 @@ class GlobalPlugin(globalPluginHandler.GlobalPlugin):
 			# Translators: error if summary of next track is not available
 			ui.message(_("No next track"))
 			return
-		msg = ""
-		for k, v in info.items():
-			tempMsg = "%s: %s; "%(k.title(), v)
-			msg = ''.join([msg, tempMsg])
+		msg = apiUtils.formatTrackSummary(info)
 		ui.message(msg)
 
 
@@ -279,6 +369,98 @@ class AddonSettings(settingsDialogs.SettingsPanel):
 		moveDownAction.Bind(wx.EVT_BUTTON, lambda event: self.onButtonClick(event, "DOWN"))
 		summarySizerHelper.addItem(actionHelper)
 		settingsSizerHelper.addItem(summarySizerHelper)
+		performancePanelSizer = wx.StaticBoxSizer(
+			wx.StaticBox(
+				self,
+				# Translators: label for group of performance settings
+				label=_("Performance:")
+			),
+			wx.VERTICAL
+		)
+		performanceSizerHelper = guiHelper.BoxSizerHelper(self, sizer=performancePanelSizer)
+		# Translators: label for playback info cache time in settings
+		playbackTTLLabelText = _("Reuse playback info for (milliseconds):")
+		self.playbackTTLEdit = performanceSizerHelper.addLabeledControl(
+			playbackTTLLabelText,
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=0,
+			max=10000,
+			initial=addonConfig["playbackInfoTTL"]
+		)
+		# Translators: label for number of playlist rows fetched in advance in settings
+		prefetchLabelText = _("Playlist rows to prefetch around the focused one:")
+		self.prefetchEdit = performanceSizerHelper.addLabeledControl(
+			prefetchLabelText,
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=0,
+			max=20,
+			initial=addonConfig["prefetchWindow"]
+		)
+		# Translators: label for a checkbox in settings
+		pollingLabelText = _("Keep playback info updated in &background")
+		self.pollingCheckBox = performanceSizerHelper.addItem(wx.CheckBox(self, label=pollingLabelText))
+		self.pollingCheckBox.SetValue(addonConfig["backgroundPolling"])
+		# Translators: label for a checkbox in settings
+		extrapolateLabelText = _("Compute elapsed and remaining &times locally")
+		self.extrapolateCheckBox = performanceSizerHelper.addItem(wx.CheckBox(self, label=extrapolateLabelText))
+		self.extrapolateCheckBox.SetValue(addonConfig["extrapolateTime"])
+		# Translators: label for a checkbox in settings
+		staleLabelText = _("Speak current track info at once from &cache, then update it if changed")
+		self.staleCheckBox = performanceSizerHelper.addItem(wx.CheckBox(self, label=staleLabelText))
+		self.staleCheckBox.SetValue(addonConfig["staleWhileRevalidate"])
+		# Translators: label for a checkbox in settings
+		announceLabelText = _("&Announce new tracks automatically, unless the microphone is on")
+		self.announceCheckBox = performanceSizerHelper.addItem(wx.CheckBox(self, label=announceLabelText))
+		self.announceCheckBox.SetValue(addonConfig["announceTrackChange"])
+		# Translators: label for a checkbox in settings
+		mirrorLabelText = _("Keep a local copy of the whole &playlist")
+		self.mirrorCheckBox = performanceSizerHelper.addItem(wx.CheckBox(self, label=mirrorLabelText))
+		self.mirrorCheckBox.SetValue(addonConfig["playlistMirror"])
+		# Translators: label for a checkbox in settings
+		storeLabelText = _("Remember track details across NVDA &restarts")
+		self.storeCheckBox = performanceSizerHelper.addItem(wx.CheckBox(self, label=storeLabelText))
+		self.storeCheckBox.SetValue(addonConfig["persistentCache"])
+		settingsSizerHelper.addItem(performanceSizerHelper)
+		diagnosticsPanelSizer = wx.StaticBoxSizer(
+			wx.StaticBox(
+				self,
+				# Translators: label for group of diagnostics settings
+				label=_("Diagnostics:")
+			),
+			wx.VERTICAL
+		)
+		diagnosticsSizerHelper = guiHelper.BoxSizerHelper(self, sizer=diagnosticsPanelSizer)
+		# Translators: label for a checkbox in settings
+		metricsLabelText = _("Collect request &latency statistics")
+		self.metricsCheckBox = diagnosticsSizerHelper.addItem(wx.CheckBox(self, label=metricsLabelText))
+		self.metricsCheckBox.SetValue(addonConfig["collectMetrics"])
+		# Translators: label for the read-only statistics in settings
+		statsLabelText = _("Statistics:")
+		self.statsEdit = diagnosticsSizerHelper.addLabeledControl(
+			statsLabelText,
+			wx.TextCtrl,
+			style=wx.TE_MULTILINE|wx.TE_READONLY,
+			size=(500, 150)
+		)
+		self.statsEdit.SetValue(getDiagnosticsText())
+		# Translators: label for a button in settings
+		resetStatsButton = diagnosticsSizerHelper.addItem(wx.Button(self, label=_("Reset &statistics")))
+		resetStatsButton.Bind(wx.EVT_BUTTON, self.onResetStats)
+		# Translators: label for number of calls profiled by the capture gesture in settings
+		profileLabelText = _("Add-on calls and events to profile on request:")
+		self.profileEdit = diagnosticsSizerHelper.addLabeledControl(
+			profileLabelText,
+			nvdaControls.SelectOnFocusSpinCtrl,
+			min=1,
+			max=10000,
+			initial=addonConfig["profileCalls"]
+		)
+		settingsSizerHelper.addItem(diagnosticsSizerHelper)
+
+	def onResetStats(self, event):
+		if apiUtils.isLoaded():
+			apiUtils.resetDiagnostics()
+		self.statsEdit.SetValue(getDiagnosticsText())
 
 	def onButtonClick(self, event, direction):
 		index = self.infoList.GetSelection()
@@ -308,8 +490,24 @@ class AddonSettings(settingsDialogs.SettingsPanel):
 		encodedPwd = utils.encodeBase64String(clearPwd)
 		addonConfig["password"] = encodedPwd
 		addonConfig["infoSummary"] = list(self.infoList.CheckedStrings)
+		addonConfig["playbackInfoTTL"] = self.playbackTTLEdit.GetValue()
+		addonConfig["prefetchWindow"] = self.prefetchEdit.GetValue()
+		addonConfig["backgroundPolling"] = self.pollingCheckBox.GetValue()
+		addonConfig["extrapolateTime"] = self.extrapolateCheckBox.GetValue()
+		addonConfig["staleWhileRevalidate"] = self.staleCheckBox.GetValue()
+		addonConfig["announceTrackChange"] = self.announceCheckBox.GetValue()
+		addonConfig["playlistMirror"] = self.mirrorCheckBox.GetValue()
+		addonConfig["persistentCache"] = self.storeCheckBox.GetValue()
+		addonConfig["collectMetrics"] = self.metricsCheckBox.GetValue()
+		addonConfig["profileCalls"] = self.profileEdit.GetValue()
 		if self.orderChanged:
 			addonConfig["infoOrderSummary"] = [self.infoList.GetString(n) for n in range(0, self.infoList.Count)]
+		if apiUtils.isLoaded():
+			apiUtils.reloadConnection()
+		if isPollingWanted():
+			apiUtils.startPolling(isRadioBossRunning, speakAnnouncement)
+		elif apiUtils.isLoaded():
+			apiUtils.stopPolling()
 
 
 class IPValidator(wx.Validator):
@@ -1,4 +1,60 @@
 # -*- coding: UTF-8 -*-
 # RadioBOSS app module
 # Copyright (C) 2024 Alberto Buffolino
-# Released under GPL 2
\ No newline at end of file
+# Released under GPL 2
+
+import importlib
+import os
+import sys
+import types
+
+from threading import Lock
+
+# the add-on entry points drop "radioBoss" from sys.modules and the shared folder
+# from sys.path once imported, so both are restored while loading submodules later
+_package = sys.modules[__name__]
+SHARED = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_importLock = Lock()
+
+
+class LazyModule(types.ModuleType):
+	"""Stands for radioBoss.<name>, importing it on first attribute access."""
+
+	def __init__(self, name):
+		super().__init__("%s.%s"%(__name__, name))
+		self._module = None
+
+	def isLoaded(self):
+		# each entry point has its own proxy, so a module loaded through another counts too
+		return self._module is not None or self.__name__ in sys.modules
+
+	def load(self):
+		if self._module is None:
+			with _importLock:
+				if self._module is None:
+					self._module = _importSubmodule(self.__name__)
+		return self._module
+
+	def __getattr__(self, attr):
+		# only reached for names not set on the proxy itself
+		return getattr(self.load(), attr)
+
+
+def _importSubmodule(name):
+	module = sys.modules.get(name)
+	if module is not None:
+		return module
+	missingPackage = sys.modules.get(__name__) is None
+	missingPath = SHARED not in sys.path
+	if missingPackage:
+		sys.modules[__name__] = _package
+	if missingPath:
+		# vendored dependencies like multipledispatch live there too
+		sys.path.insert(0, SHARED)
+	try:
+		return importlib.import_module(name)
+	finally:
+		if missingPath:
+			sys.path.remove(SHARED)
+		if missingPackage:
+			sys.modules.pop(__name__, None)
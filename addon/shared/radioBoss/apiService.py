@@ -0,0 +1,107 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+from logHandler import log
+from threading import Event, Lock, Thread
+
+# workers doing the blocking HTTP calls
+WORKERS = 4
+# workers for speculative requests, kept apart so they never queue interactive ones
+BACKGROUND_WORKERS = 2
+# seconds to wait for the loop thread at shutdown
+STOP_TIMEOUT = 2.0
+
+_service = None
+_serviceLock = Lock()
+# latest future submitted with a given key, superseded by the next one
+_keyed = {}
+
+
+class APIService(Thread):
+	"""Background thread owning the event loop used by all API calls."""
+
+	def __init__(self, workers=WORKERS):
+		super().__init__(name="radioBossAPIService", daemon=True)
+		self.loop = asyncio.new_event_loop()
+		self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="radioBossFetcher")
+		self.loop.set_default_executor(self.executor)
+		self.backgroundExecutor = ThreadPoolExecutor(
+			max_workers=BACKGROUND_WORKERS,
+			thread_name_prefix="radioBossBackgroundFetcher"
+		)
+		self.ready = Event()
+
+	def run(self):
+		asyncio.set_event_loop(self.loop)
+		self.loop.call_soon(self.ready.set)
+		try:
+			self.loop.run_forever()
+			self.cancelPending()
+			self.backgroundExecutor.shutdown(wait=False, cancel_futures=True)
+			self.loop.run_until_complete(self.loop.shutdown_default_executor())
+		except Exception:
+			log.error("RadioBOSS API service stopped unexpectedly", exc_info=True)
+		finally:
+			self.loop.close()
+
+	def cancelPending(self):
+		pending = asyncio.all_tasks(self.loop)
+		for task in pending:
+			task.cancel()
+		if pending:
+			self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+
+	def submit(self, coro):
+		"""Schedules coro on the service loop, returning a concurrent.futures.Future."""
+		return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+	def call(self, func, *args):
+		"""Runs a plain callable on the service loop thread."""
+		self.loop.call_soon_threadsafe(func, *args)
+
+	def stop(self):
+		if self.loop.is_running():
+			self.loop.call_soon_threadsafe(self.loop.stop)
+		self.join(STOP_TIMEOUT)
+
+
+def getService():
+	global _service
+	with _serviceLock:
+		if _service is None or not _service.is_alive():
+			_service = APIService()
+			_service.start()
+			_service.ready.wait()
+		return _service
+
+def submit(coro, key=None):
+	"""Schedules coro on the service; a key cancels the previous request with the same key."""
+	future = getService().submit(coro)
+	if key is not None:
+		previous = _keyed.get(key)
+		_keyed[key] = future
+		if previous is not None:
+			previous.cancel()
+	return future
+
+def run(coro, timeout=None):
+	"""Runs coro on the service loop and blocks until its result is available."""
+	future = submit(coro)
+	try:
+		return future.result(timeout)
+	except TimeoutError:
+		future.cancel()
+		raise
+
+def stop():
+	global _service
+	with _serviceLock:
+		service, _service = _service, None
+	_keyed.clear()
+	if service is not None:
+		service.stop()
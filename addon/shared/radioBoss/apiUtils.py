@@ -4,147 +4,783 @@
 # Released under GPL 2
 
 import asyncio
+import globalVars
+import os
+import queue
+import random
+import re
 import requests
+import time
 
 from logHandler import log
-from threading import Thread
+from requests.adapters import HTTPAdapter
+from threading import Lock
 
-from . import utils, xmlParser
+from . import apiService, metrics, profiler, utils, xmlParser
+from .breaker import CircuitBreaker
+from .cache import SnapshotCache, TrackCache
+from .clock import PlaybackClock
 from .configManager import addonConfig
-from .constants import Actions, XPaths, TrackDetails
+from .connection import ConnectionProfile
+from .constants import Actions, XPaths
+from .models import PlaybackInfo, Track
+from .errors import (
+	APIError, APITimeoutError, APIConnectionError, APIUnavailableError, APIHTTPError, APIResponseError
+)
+from .playlist import PlaylistMirror
+from .poller import PlaybackPoller
+from .search import PlaylistIndex
+from .store import TrackStore, canAnswer
 
 DEBUG = False
-TEMPLATE = "{protocol}://{host}:{port}/?pass={pwd}&action={action}"
+# max keep-alive sockets kept open towards RadioBOSS
+POOL_SIZE = apiService.WORKERS+apiService.BACKGROUND_WORKERS
+
+# compiled connection settings, rebuilt by reloadConnection
+_profile = None
+# shared keep-alive session, rebuilt when connection settings change
+_session = None
+_sessionKey = None
+_sessionLock = Lock()
+
+# last playbackinfo response, shared by all report functions
+playbackCache = SnapshotCache()
+# parsed trackinfo records by playlist position
+trackCache = TrackCache(addonConfig["trackCacheSize"])
+metrics.configure(addonConfig["collectMetrics"])
+# interactive requests in flight, background work waits for them
+_interactive = set()
+# pending prefetch of playlist rows
+_prefetch = None
+# pending background load or sync of the playlist copy
+_playlistSync = None
+# local extrapolation of pos/len/playingtimeleft
+clock = PlaybackClock()
+playlist = PlaylistMirror()
+searchIndex = PlaylistIndex()
+# seconds queued track store writes wait, to be done together
+STORE_FLUSH_DELAY = 5
+# how much longer than usual a sample is trusted when RadioBOSS doesn't answer
+HICCUP_FACTOR = 2
+# read-only actions, safe to send again
+IDEMPOTENT_ACTIONS = (Actions.QUERY_MIC, Actions.PLAYBACKINFO, Actions.TRACKINFO)
+MAX_RETRIES = 2
+# seconds, doubled at each retry and jittered
+RETRY_DELAY = 0.05
+# extra seconds the script thread waits beyond the request deadline
+DEADLINE_MARGIN = 0.5
 
 def debugLog(message):
 	if DEBUG:
 		log.info(message)
 
 def errMsg(info):
+	if isinstance(info, APIError):
+		log.error("RadioBOSS API {error}: {data}".format(error=type(info).__name__, data=info))
+		return info.getMessage()
 	msg = _("Something went wrong. See log for details")
 	log.error("RadioBOSS API response: {data}".format(data=info))
 	return msg
 
+def getProfile():
+	global _profile
+	profile = _profile
+	if profile is None:
+		profile = _profile = ConnectionProfile.fromConfig(addonConfig)
+	return profile
+
+def reloadConnection():
+	"""Rebuilds the connection profile after config changes, dropping connections if the endpoint changed."""
+	global _profile
+	# a profile capture keeps metrics on until it ends
+	metrics.configure(addonConfig["collectMetrics"] or profiler.isCapturing())
+	oldProfile, _profile = _profile, ConnectionProfile.fromConfig(addonConfig)
+	if oldProfile is None or oldProfile.key != _profile.key:
+		resetSession()
+	elif not addonConfig["playlistMirror"]:
+		dropPlaylist()
+
 def buildURL(action, params=None):
-	protocol = addonConfig["protocol"]
-	host = addonConfig["host"]
-	port = addonConfig["port"]
-	encodedPwd = addonConfig["password"]
-	pwd = utils.decodeBase64String(encodedPwd)
-	url = TEMPLATE.format(protocol=protocol, host=host, port=port, pwd=pwd, action=action)
-	if params:
-		url = '&'.join([url, *params])
+	url = getProfile().buildURL(action, params)
 	return url
 
-async def fetchURL(**kwargs):
-	url = buildURL(**kwargs)
+def getSession():
+	global _session, _sessionKey
+	key = getProfile().key
+	with _sessionLock:
+		if _session is None or key != _sessionKey:
+			if _session is not None:
+				_session.close()
+			session = requests.Session()
+			adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+			session.mount("http://", adapter)
+			session.mount("https://", adapter)
+			_session = session
+			_sessionKey = key
+			debugLog("New session for %s://%s:%s"%key)
+		return _session
+
+def resetSession():
+	global _session, _sessionKey
+	with _sessionLock:
+		if _session is not None:
+			_session.close()
+		_session = _sessionKey = None
+	playbackCache.clear()
+	trackCache.clear()
+	dropPlaylist()
+	clock.invalidate()
+	breaker.reset()
+
+def getBudget(action):
+	"""Seconds a request for action may take, retries included."""
+	return addonConfig["timeouts"][str(action)]
+
+def hidePassword(text):
+	return re.sub(r"pass=[^&\s]*", "pass=***", str(text))
+
+def fetch(url, timeout):
+	try:
+		req = getSession().get(url, timeout=timeout)
+	except requests.Timeout as e:
+		raise APITimeoutError(hidePassword(e)) from e
+	except requests.ConnectionError as e:
+		raise APIConnectionError(hidePassword(e)) from e
+	except requests.RequestException as e:
+		raise APIError(hidePassword(e)) from e
+	if not req.ok:
+		raise APIHTTPError(req.status_code, req.reason)
+	# raw bytes: the XML parser decodes them, no charset guessing needed
+	return req.content
+
+def timedFetch(action, url, timeout, queued):
+	# worker side of fetchOnce: measures the wait for a free worker, then the round trip
+	if not metrics.enabled:
+		return fetch(url, timeout)
+	start = time.perf_counter()
+	metrics.record(action, "handoff", start-queued)
+	try:
+		return fetch(url, timeout)
+	finally:
+		metrics.record(action, "http", time.perf_counter()-start)
+
+async def fetchOnce(action, url, timeout, background):
+	# resumes as soon as the worker sets the result, no polling
+	loop = asyncio.get_running_loop()
+	if background:
+		while _interactive:
+			await asyncio.wait(tuple(_interactive))
+		executor = apiService.getService().backgroundExecutor
+		future = loop.run_in_executor(executor, timedFetch, action, url, timeout, time.perf_counter())
+	else:
+		future = loop.run_in_executor(None, timedFetch, action, url, timeout, time.perf_counter())
+		_interactive.add(future)
+		future.add_done_callback(_interactive.discard)
+	try:
+		res = await asyncio.wait_for(future, timeout)
+	except asyncio.TimeoutError as e:
+		raise APITimeoutError("no answer in %.1f seconds"%timeout) from e
+	return res
+
+async def fetchURL(action, params=None, background=False):
+	if breaker.isOpen():
+		raise APIUnavailableError("circuit open since %.1f seconds"%breaker.getOpenTime())
+	with metrics.timer(action, "build"):
+		url = buildURL(action, params)
 	debugLog("Fetching URL: %s"%url)
-	fetcher = Fetcher(url)
-	fetcher.start()
-	while fetcher.is_alive():
-		await asyncio.sleep(0.1)
-	fetcher.join()
-	res = fetcher.res
+	metrics.count(action, "requests")
+	loop = asyncio.get_running_loop()
+	deadline = loop.time()+getBudget(action)
+	retries = MAX_RETRIES if action in IDEMPOTENT_ACTIONS else 0
+	attempt = 0
+	while True:
+		try:
+			res = await fetchOnce(action, url, deadline-loop.time(), background)
+			breaker.recordSuccess()
+			return res
+		except APIError as e:
+			# jittered exponential backoff, only if it fits the deadline
+			delay = random.uniform(0, RETRY_DELAY*2**attempt)
+			if not e.retryable or attempt >= retries or loop.time()+delay >= deadline:
+				# RadioBOSS answering with an error is still alive
+				if e.retryable:
+					breaker.recordFailure()
+				metrics.count(action, type(e).__name__)
+				raise
+			debugLog("Retrying %s after %s"%(action, e))
+			metrics.count(action, "retries")
+			attempt += 1
+			await asyncio.sleep(delay)
+
+async def probeAPI():
+	url = buildURL(Actions.QUERY_MIC)
+	await fetchOnce(Actions.QUERY_MIC, url, getBudget(Actions.QUERY_MIC), True)
+
+# fails fast while RadioBOSS is unreachable
+breaker = CircuitBreaker(probeAPI, addonConfig["breakerThreshold"])
+
+def runRequest(coro, action):
+	"""Runs a request coroutine on the API service, waiting no longer than its deadline."""
+	try:
+		with metrics.timer(action, "total"):
+			return apiService.run(coro, getBudget(action)+DEADLINE_MARGIN)
+	except TimeoutError as e:
+		raise APITimeoutError("no answer from the API service") from e
+
+def parseResponse(info, *args):
+	try:
+		return xmlParser.parse(info, *args)
+	except Exception as e:
+		raise APIResponseError(info) from e
+
+async def requestPlaybackInfo():
+	info = await fetchURL(Actions.PLAYBACKINFO)
+	try:
+		with metrics.timer(Actions.PLAYBACKINFO, "parse"):
+			playbackInfo = PlaybackInfo.fromResponse(info)
+	except Exception as e:
+		clock.invalidate()
+		raise APIResponseError(info) from e
+	clock.sync(playbackInfo.playback, playbackInfo.stamp)
+	return playbackInfo
+
+async def fetchPlaybackInfo():
+	ttl = addonConfig["playbackInfoTTL"]/1000
+	res = await playbackCache.get(Actions.PLAYBACKINFO, requestPlaybackInfo, ttl)
+	return res
+
+def getPlaybackInfo():
+	"""Returns a PlaybackInfo and, if it's the last known one, its age in seconds."""
+	try:
+		return runRequest(fetchPlaybackInfo(), Actions.PLAYBACKINFO), None
+	except APIError:
+		lastKnown = playbackCache.peek(Actions.PLAYBACKINFO) if breaker.isOpen() else None
+		if not lastKnown:
+			raise
+		age, info = lastKnown
+		return info, age
+
+def answerFromCache(compute, onChange, key):
+	"""Stale-while-revalidate: returns compute(info) on the cached PlaybackInfo at once.
+
+	The document is then refreshed in background, and onChange gets the new answer
+	(from the API service thread) if it differs. None means no usable cached answer.
+	"""
+	if onChange is None or not addonConfig["staleWhileRevalidate"]:
+		return None
+	lastKnown = playbackCache.peek(Actions.PLAYBACKINFO)
+	if not lastKnown or lastKnown[0] > addonConfig["staleMaxAge"]:
+		return None
+	age, info = lastKnown
+	try:
+		answer = compute(info)
+	except APIError:
+		return None
+	if age*1000 < addonConfig["playbackInfoTTL"]:
+		return answer
+	async def revalidate():
+		try:
+			newAnswer = compute(await fetchPlaybackInfo())
+		except APIError as e:
+			debugLog(e)
+			return
+		if newAnswer != answer:
+			onChange(newAnswer)
+	apiService.submit(revalidate(), key=key)
+	return answer
+
+def annotateAge(msg, age):
+	if age is None:
+		return msg
+	# Translators: appended to info from the last answer received, when RadioBOSS is unreachable
+	note = _("(last known, {age} ago)").format(age=utils.fixedTime(age*1000))
+	return ' '.join([msg, note])
+
+
+class LastKnownDetails(dict):
+	"""Track details from the last answer received, with its age in seconds."""
+
+	def __init__(self, details, age):
+		super().__init__(details)
+		self.age = age
+
+
+def formatTrackSummary(info):
+	msg = ""
+	for k, v in info.items():
+		tempMsg = "%s: %s; "%(k.title(), v)
+		msg = ''.join([msg, tempMsg])
+	return annotateAge(msg, getattr(info, "age", None))
+
+def getPlaybackTimes():
+	"""Returns (pos, len, playingtimeleft) in milliseconds and, if last known, their age."""
+	extrapolate = addonConfig["extrapolateTime"]
+	maxAge = addonConfig["extrapolationMaxAge"]
+	if extrapolate:
+		# while RadioBOSS is unreachable an older sample beats the last known answer
+		times = clock.getTimes(maxAge*HICCUP_FACTOR if breaker.isOpen() else maxAge)
+		if times:
+			return times, None
+	try:
+		info, age = getPlaybackInfo()
+		playback = info.playback
+		return (playback.pos, playback.length, playback.playingTimeLeft), age
+	except APIError:
+		# ride out brief API hiccups on the last sample
+		times = clock.getTimes(maxAge*HICCUP_FACTOR) if extrapolate else None
+		if not times:
+			raise
+		return times, None
+
+# optional background poller keeping a live PlaybackInfo
+poller = PlaybackPoller(lambda: fetchPlaybackInfo())
+
+def startPolling(isRunning=None, announce=None):
+	"""Starts the poller; announce(msg), if given, speaks track changes when enabled."""
+	global _announce
+	if isRunning:
+		poller.isRunning = isRunning
+	if announce:
+		_announce = announce
+	poller.start(apiService.getService(), addonConfig["pollMaxInterval"])
+
+def stopPolling():
+	global _lastTrackKey
+	poller.stop(apiService.getService())
+	# a later start must not announce the track played meanwhile
+	_lastTrackKey = None
+
+# track change announcements, driven by the poller
+
+_announce = None
+_lastTrackKey = None
+
+def getTrackKey(track):
+	# file and cast title tell a new track, without comparing all details
+	if track is None:
+		return None
+	return (track.get("FILENAME"), track.get("CASTTITLE"))
+
+@profiler.profiled
+def onPolledState(previous, state):
+	# called on the service loop after each successful poll
+	global _lastTrackKey
+	key = getTrackKey(state.current)
+	if key == _lastTrackKey:
+		return
+	first = _lastTrackKey is None
+	_lastTrackKey = key
+	if first or key is None or _announce is None or not addonConfig["announceTrackChange"]:
+		return
+	asyncio.ensure_future(announceTrack(state.current))
+
+poller.listeners.append(onPolledState)
+
+async def announceTrack(track):
+	try:
+		status = await fetchURL(Actions.QUERY_MIC, background=True)
+	except APIError:
+		# better a spoken change than a missed one
+		status = None
+	if status is not None and status.strip() == b"1":
+		debugLog("Track change not announced while mic is on")
+		return
+	details = [detail.upper() for detail in addonConfig["infoSummary"]]
+	_announce(formatTrackSummary({detail: track.get(detail) for detail in details}))
+
+def getLiveTrack(track):
+	state = poller.getState()
+	if state:
+		return state.getTrack(track)
+	return None
+
+def getTrack(info, track):
+	res = info.getTrack(track)
+	if res is None:
+		raise APIResponseError("no %s track"%track)
 	return res
 
+# local copy of the whole playlist
+
+def parsePlaylist(info):
+	with metrics.timer(Actions.PLAYLIST, "parse"):
+		try:
+			rows = xmlParser.findAll(info, XPaths.PLAYLIST_TRACK)
+		except Exception as e:
+			raise APIResponseError(info) from e
+		return [Track.fromAttrs(row) for row in rows]
+
+async def requestPlaylist():
+	info = await fetchURL(Actions.PLAYLIST, background=playlist.isLoaded())
+	# thousands of rows: keep the loop free while they are parsed and compared
+	loop = asyncio.get_running_loop()
+	tracks = await loop.run_in_executor(None, parsePlaylist, info)
+	changes = await loop.run_in_executor(None, syncPlaylist, tracks)
+	if changes:
+		# row details cached by position may belong to other tracks now
+		trackCache.clear()
+		debugLog("Playlist synced: %s"%(changes,))
+	return changes
+
+def syncPlaylist(tracks):
+	changes = playlist.sync(tracks)
+	if changes:
+		searchIndex.update(changes.removed, changes.added, playlist.tracks)
+	return changes
+
+def syncPlaylistLater():
+	global _playlistSync
+	# a sync in progress is left to finish, not restarted at each call
+	if _playlistSync is None or _playlistSync.done():
+		_playlistSync = apiService.submit(requestPlaylist())
+
+def loadPlaylist():
+	"""Tells if the playlist copy is loaded, never waiting for it.
+
+	The whole playlist is loaded in background by the first call,
+	and synced again by later ones when older than playlistSyncInterval.
+	"""
+	if not playlist.isLoaded() or playlist.isStale(addonConfig["playlistSyncInterval"]):
+		syncPlaylistLater()
+	return playlist.isLoaded()
+
+def getPlaylistLoadError():
+	# the APIError of the last background load, if it failed
+	future = _playlistSync
+	if future is None or not future.done() or future.cancelled():
+		return None
+	error = future.exception()
+	return error if isinstance(error, APIError) else None
+
+def requirePlaylist():
+	"""Returns a message telling why the playlist copy can't be used yet, None once loaded."""
+	if not addonConfig["playlistMirror"]:
+		return playlistCopyDisabled()
+	# taken before loadPlaylist starts another load
+	error = getPlaylistLoadError()
+	if loadPlaylist():
+		return None
+	if error is not None:
+		return errMsg(error)
+	# Translators: reported by features needing the local playlist copy while it's first loaded
+	return _("Loading the playlist, try again in a moment")
+
+def dropPlaylist():
+	if _playlistSync is not None:
+		_playlistSync.cancel()
+	playlist.clear()
+	searchIndex.clear()
+
+def getMirroredTrack(pos, fingerprint=None):
+	"""Returns the track at pos from the playlist copy, None until it's loaded or if behind the row text."""
+	if not addonConfig["playlistMirror"]:
+		return None
+	# rows are asked one by one meanwhile, rather than waiting for the whole playlist
+	loadPlaylist()
+	track = playlist.getTrack(pos, fingerprint)
+	if track is None and playlist.doubted:
+		syncPlaylistLater()
+	return track
+
+def playlistCopyDisabled():
+	# Translators: reported by features needing the local playlist copy when it's disabled in settings
+	return _("Keep a local copy of the whole playlist, in RadioBOSS settings, to use this")
+
+# track details kept on disk
+
+def getStorePath():
+	return os.path.join(globalVars.appArgs.configPath, "radioBossTracks.sqlite3")
+
+def useStore():
+	# nothing is written to disk on secure screens
+	return addonConfig["persistentCache"] and not globalVars.appArgs.secure
+
+def scheduleStoreFlush():
+	async def flushLater():
+		await asyncio.sleep(STORE_FLUSH_DELAY)
+		service = apiService.getService()
+		await service.loop.run_in_executor(service.backgroundExecutor, flushStore)
+	apiService.submit(flushLater())
+
+def flushStore():
+	trackStore.flush(addonConfig["persistentCacheSize"])
+
+def openStoreLater():
+	# opening sqlite doesn't delay the script that asked first
+	apiService.getService().backgroundExecutor.submit(trackStore.open)
+
+trackStore = TrackStore(getStorePath, scheduleStoreFlush, openStoreLater)
+
+def parsePosTrack(info):
+	with metrics.timer(Actions.TRACKINFO, "parse"):
+		track = Track.fromAttrs(parseResponse(info, XPaths.POS_TRACK))
+	return track
+
+def getPosTrack(pos, fingerprint=None, details=None):
+	"""Returns the TRACK record at pos and the error, if any.
+
+	details are the ones the caller reads: tracks kept on disk answer only when given,
+	and none of them changes as tracks play.
+	"""
+	track = getMirroredTrack(pos, fingerprint)
+	if track is not None:
+		return track, None
+	track = trackCache.get(pos, fingerprint)
+	if track is not None:
+		return track, None
+	storing = fingerprint and useStore()
+	if storing and canAnswer(details):
+		track = trackStore.get(fingerprint, addonConfig["persistentCacheMaxAge"])
+		# kept out of trackCache, which answers any detail: changing ones aren't stored
+		if track is not None:
+			return track, None
+	params = ("pos=%d"%pos,)
+	try:
+		info = runRequest(fetchURL(Actions.TRACKINFO, params), Actions.TRACKINFO)
+		track = parsePosTrack(info)
+	except APIError as e:
+		return None, e
+	if track.get("FILENAME"):
+		trackCache.put(pos, track, fingerprint)
+		if storing:
+			trackStore.put(fingerprint, track)
+	return track, None
+
+async def fetchPosTracks(positions, concurrency=None, background=False):
+	"""Yields (pos, track, error) for each position, in completion order.
+
+	A failed position comes with track None and the error, without stopping the others.
+	"""
+	semaphore = asyncio.Semaphore(concurrency or addonConfig["batchConcurrency"])
+	async def fetchOne(pos):
+		track = playlist.getTrack(pos) if addonConfig["playlistMirror"] else None
+		track = track or trackCache.peek(pos)
+		if track is not None:
+			return pos, track, None
+		try:
+			async with semaphore:
+				params = ("pos=%d"%pos,)
+				info = await fetchURL(Actions.TRACKINFO, params, background)
+			track = parsePosTrack(info)
+		except APIError as e:
+			debugLog(e)
+			return pos, None, e
+		if track.get("FILENAME"):
+			trackCache.put(pos, track)
+		return pos, track, None
+	tasks = [asyncio.ensure_future(fetchOne(pos)) for pos in positions]
+	try:
+		for nextResult in asyncio.as_completed(tasks):
+			yield await nextResult
+	finally:
+		for task in tasks:
+			task.cancel()
+
+def iterPosTrackInfo(positions, concurrency=None):
+	"""Blocking generator over fetchPosTracks, usable from scripts."""
+	results = queue.Queue()
+	async def produce():
+		try:
+			async for result in fetchPosTracks(positions, concurrency):
+				results.put(result)
+		finally:
+			results.put(None)
+	future = apiService.submit(produce())
+	try:
+		while (result := results.get()) is not None:
+			yield result
+	finally:
+		future.cancel()
+
+async def prefetchPosTracks(positions):
+	concurrency = apiService.BACKGROUND_WORKERS
+	async for pos, track, error in fetchPosTracks(positions, concurrency, background=True):
+		# errors are likely rows beyond the end of the playlist
+		pass
+
+def prefetchAround(pos):
+	"""Fetches in background details of rows around pos, cancelling the previous prefetch."""
+	global _prefetch
+	if _prefetch is not None:
+		_prefetch.cancel()
+		_prefetch = None
+	window = addonConfig["prefetchWindow"]
+	if not window or not addonConfig["trackCacheSize"]:
+		return
+	if addonConfig["playlistMirror"] and playlist.isLoaded():
+		# all rows are at hand already
+		return
+	# nearest rows first
+	positions = [pos]
+	for offset in range(1, window+1):
+		positions.extend((pos+offset, pos-offset))
+	positions = [p for p in positions if p > 0]
+	_prefetch = apiService.submit(prefetchPosTracks(positions), key="prefetch")
+
+def getCacheStats():
+	stats = {
+		"playbackInfo": playbackCache.stats(),
+		"trackInfo": trackCache.stats(),
+		"playlist": playlist.stats(),
+		"search": searchIndex.stats(),
+		"store": trackStore.stats(),
+	}
+	debugLog("Playback info cache: %s"%stats)
+	return stats
+
+def getDiagnostics():
+	"""Returns latency percentiles, request counts and cache stats as text lines."""
+	return metrics.formatReport(getCacheStats())
+
+def resetDiagnostics():
+	metrics.reset()
+	playbackCache.resetStats()
+
+def terminate():
+	apiService.stop()
+	# whatever is still queued is written now, so it survives add-on reloads
+	trackStore.close(addonConfig["persistentCacheSize"])
+	_interactive.clear()
+	resetSession()
+
 # API calls
 
+@profiler.profiled
+@metrics.timed("report")
 def getMicStatus():
-	status = asyncio.run(fetchURL(action=Actions.QUERY_MIC))
-	if status == "0":
+	try:
+		status = runRequest(fetchURL(Actions.QUERY_MIC), Actions.QUERY_MIC)
+	except APIError as e:
+		return errMsg(e)
+	status = status.strip()
+	if status == b"0":
 		msg = _("Mic off")
-	elif status == "1":
+	elif status == b"1":
 		msg = _("Mic on")
 	else:
-		msg = errMsg(status)
+		msg = errMsg(APIResponseError(status))
 	return msg
 
+@profiler.profiled
+@metrics.timed("report")
 def getSongElapsedTime():
 	msg = _("Track elapsed time: {time}")
-	info = asyncio.run(fetchURL(action=Actions.PLAYBACKINFO))
 	try:
-		pos = xmlParser.parse(info, XPaths.PLAYBACK, "pos")
-		fixedPos = utils.fixedTime(pos)
-		return msg.format(time=fixedPos)
-	except Exception as e:
-		debugLog(e)
-		return errMsg(info)
+		(pos, length, remTime), age = getPlaybackTimes()
+	except APIError as e:
+		return errMsg(e)
+	fixedPos = utils.fixedTime(pos)
+	return annotateAge(msg.format(time=fixedPos), age)
 
+@profiler.profiled
+@metrics.timed("report")
 def getSongRemainingTime():
 	msg = _("Track remaining time: {time}")
-	info = asyncio.run(fetchURL(action=Actions.PLAYBACKINFO))
 	try:
-		parsedAttrs = xmlParser.parse(info, XPaths.PLAYBACK, ("pos", "len",))
-		pos, length = parsedAttrs.values()
-		remTime = int(length)-int(pos)
-		fixedRemTime = utils.fixedTime(remTime)
-		return msg.format(time=fixedRemTime)
-	except Exception as e:
-		debugLog(e)
-		return errMsg(info)
+		(pos, length, playlistRemTime), age = getPlaybackTimes()
+	except APIError as e:
+		return errMsg(e)
+	remTime = length-pos
+	fixedRemTime = utils.fixedTime(remTime)
+	return annotateAge(msg.format(time=fixedRemTime), age)
 
+@profiler.profiled
+@metrics.timed("report")
 def getPlaylistRemainingTime():
 	msg = _("Playlist remaining time: {time}")
-	info = asyncio.run(fetchURL(action=Actions.PLAYBACKINFO))
 	try:
-		remTime = xmlParser.parse(info, XPaths.PLAYBACK, "playingtimeleft")
-		fixedRemTime = utils.fixedTime(remTime)
-		return msg.format(time=fixedRemTime)
-	except Exception as e:
-		debugLog(e)
-		return errMsg(info)
+		(pos, length, remTime), age = getPlaybackTimes()
+	except APIError as e:
+		return errMsg(e)
+	fixedRemTime = utils.fixedTime(remTime)
+	return annotateAge(msg.format(time=fixedRemTime), age)
 
-def getCurrentTrackInfo(detail):
-	msg = _("{detail} of the current track: {res}")
-	info = asyncio.run(fetchURL(action=Actions.PLAYBACKINFO))
-	try:
-		res = xmlParser.parse(info, XPaths.CURRENT_TRACK, detail)
-		return msg.format(detail=detail.title(), res=res)
-	except Exception as e:
-		debugLog(e)
-		return errMsg(info)
+@profiler.profiled
+def preparePlaylistSearch():
+	"""Returns a message if the playlist can't be searched yet, None when it can."""
+	return requirePlaylist()
 
-def getPlaybackTrackInfo(track, details=None):
-	info = asyncio.run(fetchURL(action=Actions.PLAYBACKINFO))
-	XPath = getattr(XPaths, "%s_TRACK"%track.upper())
-	details = tuple(TrackDetails) if not details else tuple(details)
-	try:
-		res = xmlParser.parse(info, XPath, details)
-		return res
-	except Exception as e:
-		debugLog(e)
-		return errMsg(info)
+@profiler.profiled
+def searchPlaylist(query, limit=50):
+	"""Returns (pos, track) of playlist rows whose artist, title, album or tags match query."""
+	return searchIndex.search(query, limit)
 
-def getPosTrackInfo(pos, detail):
-	msg = _("{detail} of track {pos}: {res}")
-	params = ("pos=%d"%pos,)
-	info = asyncio.run(fetchURL(action=Actions.TRACKINFO, params=params))
+@profiler.profiled
+@metrics.timed("report")
+def getTimeToPosTrack(pos):
+	# Translators: time until the track at a playlist position starts playing
+	msg = _("Track {pos} starts in {time}")
+	error = requirePlaylist()
+	if error is not None:
+		return error
 	try:
-		res = xmlParser.parse(info, XPaths.POS_TRACK, detail)
-		return msg.format(detail=detail.title(), pos=pos, res=res)
-	except Exception as e:
-		debugLog(e)
-		return errMsg(info)
+		info, age = getPlaybackInfo()
+	except APIError as e:
+		return errMsg(e)
+	playback = info.playback
+	current = playback.playlistPos
+	start = playlist.getStart(pos)
+	currentEnd = playlist.getStart(current+1) if current else None
+	if start is None or currentEnd is None or pos <= current:
+		# Translators: reported when asking when a track starts, if it's not later in the playlist
+		return _("Track {pos} is not coming up in the playlist").format(pos=pos)
+	remaining = max(0, playback.length-playback.pos)+start-currentEnd
+	return annotateAge(msg.format(pos=pos, time=utils.fixedTime(remaining)), age)
 
-def getFullPosTrackInfo(pos):
-	params = ("pos=%d"%pos,)
-	details = tuple(TrackDetails)
-	info = asyncio.run(fetchURL(action=Actions.TRACKINFO, params=params))
-	try:
-		res = xmlParser.parse(info, XPaths.POS_TRACK, details)
+@profiler.profiled
+@metrics.timed("report")
+def getCurrentTrackInfo(detail, onChange=None):
+	msg = _("{detail} of the current track: {res}")
+	liveTrack = getLiveTrack("current")
+	if liveTrack is not None:
+		return msg.format(detail=detail.title(), res=liveTrack.get(detail))
+	compute = lambda info: msg.format(detail=detail.title(), res=getTrack(info, "current").get(detail))
+	res = answerFromCache(compute, onChange, key=("revalidate", detail))
+	if res is not None:
 		return res
-	except Exception as e:
-		debugLog(e)
-		return errMsg(info)
-
+	try:
+		info, age = getPlaybackInfo()
+		res = compute(info)
+	except APIError as e:
+		return errMsg(e)
+	return annotateAge(res, age)
 
-class Fetcher(Thread):
+@profiler.profiled
+@metrics.timed("report")
+def getPlaybackTrackInfo(track, details=None, onChange=None):
+	"""Returns the whole Track, or a dict of the given details only."""
+	details = tuple(details) if details else None
+	select = lambda res: res if details is None else {detail: res.get(detail) for detail in details}
+	liveTrack = getLiveTrack(track)
+	if liveTrack is not None:
+		return select(liveTrack)
+	compute = lambda info: select(getTrack(info, track))
+	res = answerFromCache(compute, onChange, key=("revalidate", track, details))
+	if res is not None:
+		return res
+	try:
+		info, age = getPlaybackInfo()
+		res = compute(info)
+	except APIError as e:
+		return errMsg(e)
+	if age is not None:
+		return LastKnownDetails(res, age)
+	return res
 
-	def __init__(self, url, *args, **kwargs):
-		super().__init__(*args, **kwargs)
-		self.url = url
-		self.res = None
+@profiler.profiled
+@metrics.timed("report")
+def getPosTrackInfo(pos, detail, fingerprint=None):
+	msg = _("{detail} of track {pos}: {res}")
+	track, error = getPosTrack(pos, fingerprint, (detail,))
+	if track is None:
+		return errMsg(error)
+	res = track.get(detail)
+	return msg.format(detail=detail.title(), pos=pos, res=res)
 
-	def run(self):
-		req = requests.get(self.url)
-		self.res = req.text
+@profiler.profiled
+@metrics.timed("report")
+def getFullPosTrackInfo(pos, fingerprint=None):
+	track, error = getPosTrack(pos, fingerprint)
+	if track is None:
+		return errMsg(error)
+	return track
@@ -0,0 +1,72 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import asyncio
+import time
+
+from logHandler import log
+
+# seconds before the first health probe, doubled at each failed one
+PROBE_DELAY = 1.0
+MAX_PROBE_DELAY = 30.0
+
+
+class CircuitBreaker:
+	"""Stops sending requests to an unreachable RadioBOSS after repeated failures.
+
+	While open, a background task probes the API with exponential backoff
+	and closes the circuit at the first success.
+	Must be driven from the API service loop.
+	"""
+
+	def __init__(self, probe, threshold=3):
+		# probe: coroutine function raising if RadioBOSS is still unreachable
+		self.probe = probe
+		self.threshold = threshold
+		self.failures = 0
+		self.openedAt = None
+		self.probeTask = None
+
+	def isOpen(self):
+		return self.openedAt is not None
+
+	def getOpenTime(self):
+		"""Seconds since the circuit opened, or None if closed."""
+		if self.openedAt is None:
+			return None
+		return time.monotonic()-self.openedAt
+
+	def recordSuccess(self):
+		self.failures = 0
+		if self.openedAt is not None:
+			log.info("RadioBOSS API reachable again")
+			self.openedAt = None
+
+	def recordFailure(self):
+		self.failures += 1
+		if self.failures < self.threshold or self.isOpen():
+			return
+		log.info("RadioBOSS API unreachable, circuit open after %d failures"%self.failures)
+		self.openedAt = time.monotonic()
+		if self.probeTask is None or self.probeTask.done():
+			self.probeTask = asyncio.ensure_future(self.probeLoop())
+
+	async def probeLoop(self):
+		delay = PROBE_DELAY
+		while self.isOpen():
+			await asyncio.sleep(delay)
+			try:
+				await self.probe()
+			except asyncio.CancelledError:
+				raise
+			except Exception:
+				delay = min(delay*2, MAX_PROBE_DELAY)
+				continue
+			self.recordSuccess()
+
+	def reset(self):
+		# a running probe loop ends by itself once closed
+		self.failures = 0
+		self.openedAt = None
@@ -0,0 +1,136 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import asyncio
+import time
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class SnapshotCache:
+	"""Keeps the last response per key for a short freshness window.
+
+	Must be used from the API service loop only: callers asking for a key
+	already being fetched join that request instead of issuing another one.
+	"""
+
+	def __init__(self):
+		# key -> (monotonic stamp, value)
+		self.entries = {}
+		# key -> asyncio.Task
+		self.inFlight = {}
+		self.hits = self.misses = self.joins = 0
+
+	async def get(self, key, fetcher, ttl):
+		entry = self.entries.get(key)
+		if entry and time.monotonic()-entry[0] < ttl:
+			self.hits += 1
+			return entry[1]
+		task = self.inFlight.get(key)
+		if task:
+			self.joins += 1
+		else:
+			self.misses += 1
+			task = asyncio.ensure_future(fetcher())
+			task.add_done_callback(lambda t: self.onFetched(key, t))
+			self.inFlight[key] = task
+		# a cancelled caller must not cancel the shared fetch
+		return await asyncio.shield(task)
+
+	def onFetched(self, key, task):
+		self.inFlight.pop(key, None)
+		if not task.cancelled() and task.exception() is None and task.result() is not None:
+			self.entries[key] = (time.monotonic(), task.result())
+
+	def peek(self, key):
+		"""Returns (age in seconds, value) of the stored entry, or None."""
+		entry = self.entries.get(key)
+		if not entry:
+			return None
+		return (time.monotonic()-entry[0], entry[1])
+
+	def clear(self):
+		self.entries.clear()
+
+	def stats(self):
+		total = self.hits+self.joins+self.misses
+		return {
+			"hits": self.hits,
+			"joins": self.joins,
+			"misses": self.misses,
+			"hitRate": (self.hits+self.joins)/total if total else 0.0,
+		}
+
+	def resetStats(self):
+		self.hits = self.misses = self.joins = 0
+
+
+class TrackCache:
+	"""Bounded LRU of parsed TRACK records keyed by playlist position.
+
+	A different row fingerprint or FILENAME at a known position means
+	the playlist changed, so the whole cache is dropped.
+	"""
+
+	def __init__(self, size=500):
+		self.size = size
+		self.lock = Lock()
+		# pos -> (fingerprint, track)
+		self.entries = OrderedDict()
+		self.hits = self.misses = self.invalidations = 0
+
+	def get(self, pos, fingerprint=None):
+		with self.lock:
+			entry = self.entries.get(pos)
+			if entry is None:
+				self.misses += 1
+				return None
+			cachedFingerprint, track = entry
+			if fingerprint and cachedFingerprint and fingerprint != cachedFingerprint:
+				self.invalidate()
+				self.misses += 1
+				return None
+			if fingerprint and not cachedFingerprint:
+				self.entries[pos] = (fingerprint, track)
+			self.entries.move_to_end(pos)
+			self.hits += 1
+			return track
+
+	def __contains__(self, pos):
+		return pos in self.entries
+
+	def peek(self, pos):
+		"""Returns the track at pos, if any, without touching stats or recency."""
+		entry = self.entries.get(pos)
+		return entry[1] if entry else None
+
+	def put(self, pos, track, fingerprint=None):
+		with self.lock:
+			entry = self.entries.get(pos)
+			if entry and entry[1].get("FILENAME") != track.get("FILENAME"):
+				self.invalidate()
+			self.entries[pos] = (fingerprint, track)
+			self.entries.move_to_end(pos)
+			while len(self.entries) > self.size:
+				self.entries.popitem(last=False)
+
+	def invalidate(self):
+		# lock already held by callers inside the class
+		self.entries.clear()
+		self.invalidations += 1
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+
+	def stats(self):
+		total = self.hits+self.misses
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"invalidations": self.invalidations,
+			"hitRate": self.hits/total if total else 0.0,
+		}
@@ -0,0 +1,63 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import time
+
+from threading import Lock
+
+
+class PlaybackClock:
+	"""Extrapolates playback times from the last playbackinfo response.
+
+	Any response, asked for by a report or by the poller, resyncs the clock;
+	one older than the sample is dropped, unless it shows another track, state or length.
+	"""
+
+	def __init__(self):
+		self.lock = Lock()
+		self.stamp = None
+		self.pos = self.length = self.playlistLeft = self.playlistPos = 0
+		self.state = None
+		self.playing = False
+
+	def sync(self, playback, stamp=None):
+		"""Records a models.Playback, sampled at stamp (time.monotonic), telling if it shows a change.
+
+		A change is a skip, a pause or resume, or a new track: extrapolating across it drifts.
+		"""
+		stamp = time.monotonic() if stamp is None else stamp
+		with self.lock:
+			changed = (playback.playlistPos, playback.state, playback.length) != (self.playlistPos, self.state, self.length)
+			if not changed and self.stamp is not None and stamp < self.stamp:
+				return False
+			self.stamp = stamp
+			self.pos, self.length, self.playlistLeft = playback.pos, playback.length, playback.playingTimeLeft
+			self.playlistPos, self.state = playback.playlistPos, playback.state
+			self.playing = playback.isPlaying
+			return changed
+
+	def invalidate(self):
+		with self.lock:
+			self.stamp = None
+			self.state = None
+
+	def getTimes(self, maxAge):
+		"""Returns extrapolated (pos, len, playingtimeleft) in milliseconds.
+
+		None means a resync is needed: no sample, sample older than maxAge seconds,
+		or a track boundary crossed since the sample.
+		"""
+		with self.lock:
+			if self.stamp is None:
+				return None
+			age = time.monotonic()-self.stamp
+			if age > maxAge:
+				return None
+			delta = int(age*1000) if self.playing else 0
+			pos = self.pos+delta
+			if self.length > 0 and pos >= self.length:
+				return None
+			playlistLeft = max(0, self.playlistLeft-delta)
+			return (pos, self.length, playlistLeft)
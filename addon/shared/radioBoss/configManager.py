@@ -13,6 +13,50 @@ confspec = {
 	"password": "string(default='')",
 	"infoSummary": 'string_list(default=list("Artist", "Title"))',
 	"infoOrderSummary": "string_list(default=list())",
+	# milliseconds a playbackinfo response is reused for
+	"playbackInfoTTL": "integer(default=1000, min=0, max=10000)",
+	"backgroundPolling": "boolean(default=False)",
+	# speak the info summary of each new track, unless the mic is on
+	"announceTrackChange": "boolean(default=False)",
+	# max seconds between background polls in the middle of a track
+	"pollMaxInterval": "integer(default=15, min=2, max=60)",
+	# max playlist rows whose details are kept in memory
+	"trackCacheSize": "integer(default=500, min=0, max=100000)",
+	# playlist rows fetched in advance above and below the focused one
+	"prefetchWindow": "integer(default=2, min=0, max=20)",
+	# max parallel requests of multi-row readouts
+	"batchConcurrency": "integer(default=4, min=1, max=16)",
+	# seconds each request may take, retries included
+	"timeouts": {
+		"mic": "float(default=1.5, min=0.2, max=30.0)",
+		"playbackinfo": "float(default=2.0, min=0.2, max=30.0)",
+		"trackinfo": "float(default=2.0, min=0.2, max=30.0)",
+		"getplaylist2": "float(default=10.0, min=1.0, max=120.0)",
+	},
+	# answer playlist rows from a local copy of the whole playlist
+	"playlistMirror": "boolean(default=False)",
+	# seconds the playlist copy is used before syncing it again in background
+	"playlistSyncInterval": "integer(default=10, min=1, max=600)",
+	# keep track details on disk across NVDA restarts
+	"persistentCache": "boolean(default=False)",
+	# max tracks kept on disk
+	"persistentCacheSize": "integer(default=20000, min=100, max=1000000)",
+	# days a track kept on disk is trusted
+	"persistentCacheMaxAge": "integer(default=30, min=1, max=365)",
+	# record latency of each request stage, see diagnostics in settings
+	"collectMetrics": "boolean(default=False)",
+	# add-on calls and events profiled by the capture gesture
+	"profileCalls": "integer(default=100, min=1, max=10000)",
+	# consecutive failures before failing fast while RadioBOSS is unreachable
+	"breakerThreshold": "integer(default=3, min=1, max=20)",
+	# speak cached track info at once, correcting it if a refresh shows a change
+	"staleWhileRevalidate": "boolean(default=False)",
+	# max seconds a cached answer can be spoken before refreshing
+	"staleMaxAge": "integer(default=30, min=1, max=600)",
+	"extrapolateTime": "boolean(default=False)",
+	# max seconds elapsed/remaining times are computed without asking RadioBOSS:
+	# a skip, pause or seek made meanwhile goes unnoticed until then, unless polling sees it first
+	"extrapolationMaxAge": "integer(default=3, min=1, max=600)",
 }
 addonName = addonHandler.getCodeAddon().manifest["name"]
 config.conf.spec[addonName] = confspec
@@ -0,0 +1,42 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+from dataclasses import dataclass
+from urllib.parse import quote
+
+from . import utils
+
+TEMPLATE = "{protocol}://{host}:{port}/?pass={pwd}&action="
+
+
+@dataclass(frozen=True)
+class ConnectionProfile:
+	"""Connection settings compiled once into the URL prefix of every request."""
+
+	protocol: str
+	host: str
+	port: int
+	prefix: str
+
+	@classmethod
+	def fromConfig(cls, conf):
+		protocol = conf["protocol"]
+		host = conf["host"]
+		port = conf["port"]
+		pwd = utils.decodeBase64String(conf["password"])
+		# IPv6 literals need brackets in URLs
+		urlHost = "[%s]"%host if ':' in host else host
+		prefix = TEMPLATE.format(protocol=protocol, host=urlHost, port=port, pwd=quote(pwd, safe=''))
+		return cls(protocol, host, port, prefix)
+
+	@property
+	def key(self):
+		return (self.protocol, self.host, self.port)
+
+	def buildURL(self, action, params=None):
+		url = self.prefix+action
+		if params:
+			url = '&'.join([url, *params])
+		return url
@@ -16,6 +16,7 @@ class Actions(DirectValueStrEnum):
 	QUERY_MIC = "mic"
 	PLAYBACKINFO = "playbackinfo"
 	TRACKINFO = "trackinfo"
+	PLAYLIST = "getplaylist2"
 
 class XPaths(DirectValueStrEnum):
 
@@ -24,6 +25,7 @@ class XPaths(DirectValueStrEnum):
 	CURRENT_TRACK = ".CurrentTrack/TRACK"
 	NEXT_TRACK = ".NextTrack/TRACK"
 	POS_TRACK = ".Track/TRACK"
+	PLAYLIST_TRACK = ".TRACK"
 
 
 class TrackDetails(DirectValueStrEnum):
@@ -0,0 +1,62 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+
+class APIError(Exception):
+	"""Base class of failures talking to the RadioBOSS API."""
+
+	# worth trying again within the deadline
+	retryable = False
+
+	def getMessage(self):
+		return _("Something went wrong. See log for details")
+
+
+class APITimeoutError(APIError):
+
+	retryable = True
+
+	def getMessage(self):
+		# Translators: error when RadioBOSS is too slow to answer
+		return _("RadioBOSS did not answer in time")
+
+
+class APIConnectionError(APIError):
+
+	retryable = True
+
+	def getMessage(self):
+		# Translators: error when RadioBOSS API is not reachable
+		return _("Unable to connect to RadioBOSS. Is Remote API enabled?")
+
+
+class APIUnavailableError(APIConnectionError):
+
+	# fail fast while the circuit is open
+	retryable = False
+
+	def getMessage(self):
+		# Translators: error when RadioBOSS API is down and add-on is waiting for it to come back
+		return _("RadioBOSS is unreachable, retrying in background")
+
+
+class APIHTTPError(APIError):
+
+	def __init__(self, status, *args):
+		super().__init__(status, *args)
+		self.status = status
+		# server side troubles may be transient
+		self.retryable = status >= 500
+
+	def getMessage(self):
+		# Translators: error when RadioBOSS API answers with an HTTP error code
+		return _("RadioBOSS API error {status}").format(status=self.status)
+
+
+class APIResponseError(APIError):
+
+	def getMessage(self):
+		# Translators: error when RadioBOSS API answers something that can't be understood
+		return _("Unexpected answer from RadioBOSS. See log for details")
@@ -0,0 +1,159 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import time
+
+from bisect import bisect_left
+from collections import Counter
+from functools import wraps
+from threading import Lock
+
+# histogram bucket upper bounds in milliseconds, growing by 19% (a quarter octave)
+# from 10 microseconds to about 80 seconds
+BOUNDS = tuple(0.01*2**(i/4) for i in range(93))
+PERCENTILES = (50, 95, 99)
+
+enabled = False
+_lock = Lock()
+# (label, stage) -> Histogram
+_histograms = {}
+# (label, name) -> count
+_counters = Counter()
+
+
+class Histogram:
+	"""Latencies bucketed on a log scale, so percentiles cost no stored samples."""
+
+	__slots__ = ("buckets", "count", "total", "max")
+
+	def __init__(self):
+		# one more bucket for anything above the last bound
+		self.buckets = [0]*(len(BOUNDS)+1)
+		self.count = 0
+		self.total = 0.0
+		self.max = 0.0
+
+	def add(self, ms):
+		self.buckets[bisect_left(BOUNDS, ms)] += 1
+		self.count += 1
+		self.total += ms
+		if ms > self.max:
+			self.max = ms
+
+	def percentile(self, percent):
+		"""Returns the upper bound of the bucket holding the given percentile, in milliseconds."""
+		if not self.count:
+			return 0.0
+		rank = self.count*percent/100
+		seen = 0
+		for index, hits in enumerate(self.buckets):
+			seen += hits
+			if seen >= rank:
+				return min(BOUNDS[index], self.max) if index < len(BOUNDS) else self.max
+		return self.max
+
+	def summary(self):
+		res = {"count": self.count, "mean": self.total/self.count if self.count else 0.0, "max": self.max}
+		for percent in PERCENTILES:
+			res["p%d"%percent] = self.percentile(percent)
+		return res
+
+
+class Timer:
+	"""Context manager recording the time spent in its block."""
+
+	__slots__ = ("label", "stage", "start")
+
+	def __init__(self, label, stage):
+		self.label = label
+		self.stage = stage
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc):
+		record(self.label, self.stage, time.perf_counter()-self.start)
+
+
+class _NullTimer:
+
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		pass
+
+
+# shared by all timed blocks while collection is off
+NULL_TIMER = _NullTimer()
+
+
+def configure(enable):
+	global enabled
+	enabled = bool(enable)
+
+def record(label, stage, seconds):
+	if not enabled:
+		return
+	with _lock:
+		histogram = _histograms.get((label, stage))
+		if histogram is None:
+			histogram = _histograms[(label, stage)] = Histogram()
+		histogram.add(seconds*1000)
+
+def count(label, name, amount=1):
+	if enabled:
+		with _lock:
+			_counters[(label, name)] += amount
+
+def timer(label, stage):
+	return Timer(label, stage) if enabled else NULL_TIMER
+
+def timed(stage):
+	"""Decorator recording the duration of each call, labelled by function name."""
+	def decorator(func):
+		@wraps(func)
+		def wrapper(*args, **kwargs):
+			if not enabled:
+				return func(*args, **kwargs)
+			with Timer(func.__name__, stage):
+				return func(*args, **kwargs)
+		return wrapper
+	return decorator
+
+def reset():
+	with _lock:
+		_histograms.clear()
+		_counters.clear()
+
+def snapshot():
+	"""Returns {label: {"stages": {stage: summary}, "counters": {name: count}}}."""
+	res = {}
+	with _lock:
+		for (label, stage), histogram in _histograms.items():
+			res.setdefault(label, {"stages": {}, "counters": {}})["stages"][stage] = histogram.summary()
+		for (label, name), value in _counters.items():
+			res.setdefault(label, {"stages": {}, "counters": {}})["counters"][name] = value
+	return res
+
+def formatReport(cacheStats=None):
+	"""Returns snapshot and cache stats as plain text lines."""
+	lines = []
+	for label, data in sorted(snapshot().items()):
+		counters = ", ".join("%s %d"%item for item in sorted(data["counters"].items()))
+		lines.append("%s%s"%(label, ": %s"%counters if counters else ""))
+		for stage, summary in sorted(data["stages"].items()):
+			lines.append("  %-8s n=%d p50=%.2f p95=%.2f p99=%.2f max=%.2f ms"%(
+				stage, summary["count"], summary["p50"], summary["p95"], summary["p99"], summary["max"]
+			))
+	for name, stats in (cacheStats or {}).items():
+		lines.append("%s cache: %s"%(name, ", ".join(
+			"%s %.0f%%"%(key, value*100) if key == "hitRate" else "%s %s"%(key, value)
+			for key, value in stats.items()
+		)))
+	return lines
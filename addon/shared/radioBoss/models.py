@@ -0,0 +1,156 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import sys
+import time
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+from . import xmlParser
+from .constants import XPaths, TrackDetails
+
+# playbackinfo track names, as used by report functions
+TRACK_XPATHS = {
+	"previous": XPaths.PREVIOUS_TRACK,
+	"current": XPaths.CURRENT_TRACK,
+	"next": XPaths.NEXT_TRACK,
+}
+
+
+# field keys, interned once and shared by all tracks
+FIELDS = tuple(sys.intern(str(detail)) for detail in TrackDetails)
+FIELD_BITS = {key: 1 << index for index, key in enumerate(FIELDS)}
+# fields Track.getInt can read as numbers
+NUMERIC_FIELDS = frozenset(("DURATION", "PLAYCOUNT", "BPM", "RATING", "YEAR", "LISTENERS"))
+
+
+class Track(Mapping):
+	"""Read-only TRACK record, mapping each TrackDetails to its text.
+
+	Only non-empty fields are stored, in FIELDS order, and a bit mask tells which;
+	the other ones read as empty strings.
+	"""
+
+	__slots__ = ("_mask", "_values")
+
+	def __init__(self, mask=0, values=()):
+		self._mask = mask
+		self._values = values
+
+	@classmethod
+	def fromAttrs(cls, attrs):
+		mask = 0
+		values = []
+		for key, bit in FIELD_BITS.items():
+			value = attrs.get(key)
+			if value:
+				mask |= bit
+				values.append(value)
+		return cls(mask, tuple(values))
+
+	def __getitem__(self, key):
+		bit = FIELD_BITS[key]
+		if not self._mask & bit:
+			return ""
+		# stored values before this one are the lower set bits
+		return self._values[(self._mask & (bit-1)).bit_count()]
+
+	def __contains__(self, key):
+		return key in FIELD_BITS
+
+	def __iter__(self):
+		return iter(FIELDS)
+
+	def __len__(self):
+		return len(FIELDS)
+
+	def __eq__(self, other):
+		if isinstance(other, Track):
+			return self._mask == other._mask and self._values == other._values
+		return super().__eq__(other)
+
+	def __hash__(self):
+		return hash((self._mask, self._values))
+
+	def __repr__(self):
+		return "Track(%r)"%{key: value for key, value in self.items() if value}
+
+	def getInt(self, key, default=None):
+		"""Parses one of NUMERIC_FIELDS, returning default if empty or not a number."""
+		if key not in NUMERIC_FIELDS:
+			raise KeyError(key)
+		try:
+			return int(self[key])
+		except ValueError:
+			return default
+
+
+def toInt(value):
+	# missing attributes count as zero
+	return int(value) if value else 0
+
+
+@dataclass(frozen=True)
+class Playback:
+
+	pos: int
+	length: int
+	playingTimeLeft: int
+	playlistPos: int
+	state: str
+
+	@classmethod
+	def fromAttrs(cls, attrs):
+		return cls(
+			pos=toInt(attrs.get("pos")),
+			length=toInt(attrs.get("len")),
+			playingTimeLeft=toInt(attrs.get("playingtimeleft")),
+			playlistPos=toInt(attrs.get("playlistpos")),
+			# assume playing if RadioBOSS doesn't say
+			state=attrs.get("state") or "play",
+		)
+
+	@property
+	def isPlaying(self):
+		return self.state == "play"
+
+
+@dataclass(frozen=True)
+class PlaybackInfo:
+	"""A whole playbackinfo document, parsed once."""
+
+	playback: Playback
+	previous: Track | None
+	current: Track | None
+	next: Track | None
+	# time.monotonic() when the document was parsed
+	stamp: float = field(default_factory=time.monotonic, compare=False)
+
+	@classmethod
+	def fromResponse(cls, info):
+		"""Raises KeyError without a Playback element, ValueError on non numeric times."""
+		found = xmlParser.extract(info, (XPaths.PLAYBACK, *TRACK_XPATHS.values()))
+		playback = Playback.fromAttrs(found[XPaths.PLAYBACK])
+		tracks = {}
+		for track, XPath in TRACK_XPATHS.items():
+			attrs = found.get(XPath)
+			tracks[track] = Track.fromAttrs(attrs) if attrs is not None else None
+		return cls(playback, **tracks)
+
+	def getTrack(self, track):
+		return getattr(self, track)
+
+	def timeToChange(self):
+		"""Seconds until the current track is expected to end, or None if not playing."""
+		playback = self.playback
+		if playback.length <= 0 or not playback.isPlaying:
+			return None
+		elapsed = time.monotonic()-self.stamp
+		remaining = (playback.length-playback.pos)/1000
+		playlistLeft = playback.playingTimeLeft/1000
+		if 0 < playlistLeft < remaining:
+			remaining = playlistLeft
+		return max(0.0, remaining-elapsed)
@@ -0,0 +1,204 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import ntpath
+import time
+
+from collections import Counter
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from itertools import accumulate
+from threading import Lock
+
+from . import utils
+
+
+def fingerprint(track):
+	# rows are told apart by file and length, not by their position
+	return hash((track.get("FILENAME"), track.get("DURATION")))
+
+def showsTrack(rowText, track):
+	# rows show some of these, whatever columns are chosen, so a row showing none is another track
+	stem = ntpath.splitext(ntpath.basename(track.get("FILENAME")))[0]
+	names = [name.lower() for name in (track.get("ARTIST"), track.get("TITLE"), track.get("CASTTITLE"), stem) if name]
+	text = rowText.lower()
+	return not names or any(name in text for name in names)
+
+def keepRows(merged, oldTracks, tracks):
+	"""Appends rows matched by fingerprint to merged, returning (index, old, new) of the edited ones.
+
+	A row keeps its file and length when retagged, rated or played,
+	so the old Track is reused only if nothing else changed either.
+	"""
+	edits = []
+	for old, new in zip(oldTracks, tracks):
+		if old == new:
+			merged.append(old)
+		else:
+			edits.append((len(merged), old, new))
+			merged.append(new)
+	return edits
+
+def duration(track):
+	try:
+		return utils.parseDuration(track.get("DURATION"))
+	except ValueError:
+		return 0
+
+
+@dataclass(frozen=True)
+class PlaylistChanges:
+
+	inserted: int = 0
+	deleted: int = 0
+	moved: int = 0
+	# rows kept in place whose other details changed
+	edited: int = 0
+	# index of the first changed row, None if unchanged
+	firstChange: int | None = None
+	# Track objects dropped from and added to the copy
+	removed: tuple = field(default=(), repr=False)
+	added: tuple = field(default=(), repr=False)
+
+	def __bool__(self):
+		return self.firstChange is not None
+
+
+class PlaylistMirror:
+	"""Local copy of the RadioBOSS playlist, patched in place on each sync.
+
+	Positions are 1-based, like playlist rows and trackinfo requests.
+	Row texts shown by RadioBOSS are checked against the copy when given:
+	a mismatch means the playlist changed since the last sync,
+	so the copy answers no row until the next one.
+	"""
+
+	def __init__(self):
+		self.lock = Lock()
+		self.clear()
+
+	def clear(self):
+		with self.lock:
+			self.tracks = []
+			self.fingerprints = []
+			# starts[i] is milliseconds from the playlist start to row i+1
+			self.starts = [0]
+			self.digest = None
+			self.stamp = None
+			# pos -> row text seen when the copy answered for it, forgotten at each sync
+			self.rowTexts = {}
+			self.doubted = False
+			self.syncs = self.reloads = 0
+
+	def __len__(self):
+		return len(self.tracks)
+
+	def isLoaded(self):
+		return self.stamp is not None
+
+	def isStale(self, maxAge):
+		return self.stamp is None or time.monotonic()-self.stamp > maxAge
+
+	def getTrack(self, pos, rowText=None):
+		"""Returns the track at pos, None if out of range or if rowText shows the copy is behind."""
+		tracks = self.tracks
+		if self.doubted or not 0 < pos <= len(tracks):
+			return None
+		track = tracks[pos-1]
+		if rowText and (self.rowTexts.setdefault(pos, rowText) != rowText or not showsTrack(rowText, track)):
+			self.doubted = True
+			return None
+		return track
+
+	def getStart(self, pos):
+		"""Milliseconds from the playlist start to row pos, None if out of range."""
+		starts = self.starts
+		if 0 < pos <= len(starts):
+			return starts[pos-1]
+		return None
+
+	def sync(self, tracks):
+		"""Replaces the copy with tracks, reusing unchanged rows, and returns the PlaylistChanges."""
+		newPrints = [fingerprint(track) for track in tracks]
+		digest = hash(tuple(newPrints))
+		with self.lock:
+			self.syncs += 1
+			# rows are checked against what they show from scratch
+			self.rowTexts = {}
+			self.doubted = False
+			oldTracks, oldPrints = self.tracks, self.fingerprints
+			if digest == self.digest and newPrints == oldPrints:
+				self.stamp = time.monotonic()
+				merged = []
+				edits = keepRows(merged, oldTracks, tracks)
+				if not edits:
+					return PlaylistChanges()
+				# same files and lengths, so the starts still hold
+				self.tracks = merged
+				return PlaylistChanges(
+					edited=len(edits),
+					firstChange=edits[0][0],
+					removed=tuple(old for index, old, new in edits),
+					added=tuple(new for index, old, new in edits),
+				)
+			# most edits touch a short stretch: skip the common head and tail first
+			head = 0
+			limit = min(len(oldPrints), len(newPrints))
+			while head < limit and oldPrints[head] == newPrints[head]:
+				head += 1
+			tail = 0
+			limit -= head
+			while tail < limit and oldPrints[-1-tail] == newPrints[-1-tail]:
+				tail += 1
+			merged = []
+			edits = keepRows(merged, oldTracks[:head], tracks[:head])
+			deleted = Counter()
+			inserted = Counter()
+			removed = []
+			added = []
+			oldMiddle = oldPrints[head:len(oldPrints)-tail]
+			newMiddle = newPrints[head:len(newPrints)-tail]
+			matcher = SequenceMatcher(None, oldMiddle, newMiddle, autojunk=False)
+			for op, oldStart, oldEnd, newStart, newEnd in matcher.get_opcodes():
+				if op == "equal":
+					edits.extend(keepRows(
+						merged, oldTracks[head+oldStart:head+oldEnd], tracks[head+newStart:head+newEnd]
+					))
+					continue
+				deleted.update(oldMiddle[oldStart:oldEnd])
+				inserted.update(newMiddle[newStart:newEnd])
+				removed.extend(oldTracks[head+oldStart:head+oldEnd])
+				added.extend(tracks[head+newStart:head+newEnd])
+				merged.extend(tracks[head+newStart:head+newEnd])
+			if tail:
+				edits.extend(keepRows(merged, oldTracks[len(oldTracks)-tail:], tracks[len(tracks)-tail:]))
+			removed.extend(old for index, old, new in edits)
+			added.extend(new for index, old, new in edits)
+			if not oldTracks:
+				self.reloads += 1
+			# a row both deleted and inserted has moved
+			moved = sum((deleted & inserted).values())
+			changes = PlaylistChanges(
+				inserted=sum(inserted.values())-moved,
+				deleted=sum(deleted.values())-moved,
+				moved=moved,
+				edited=len(edits),
+				firstChange=min(head, edits[0][0]) if edits else head,
+				removed=tuple(removed),
+				added=tuple(added),
+			)
+			starts = self.starts[:head+1]
+			starts.extend(accumulate(
+				(duration(track) for track in merged[head:]),
+				initial=starts[-1]
+			))
+			del starts[head+1]
+			self.tracks, self.fingerprints, self.starts = merged, newPrints, starts
+			self.digest = digest
+			self.stamp = time.monotonic()
+		return changes
+
+	def stats(self):
+		return {"rows": len(self.tracks), "syncs": self.syncs, "reloads": self.reloads, "doubted": self.doubted}
@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import asyncio
+import time
+
+from logHandler import log
+
+
+# seconds between polls when nothing is playing or RadioBOSS is not reachable
+IDLE_INTERVAL = 5.0
+# seconds between polls close to a track change
+DENSE_INTERVAL = 0.5
+# seconds before the predicted track change when dense polling starts
+CHANGE_LEAD = 8.0
+# extra seconds a state is trusted after the next poll was due
+GRACE = 1.0
+
+
+class PlaybackPoller:
+	"""Keeps a PlaybackInfo up to date, polling densely only around track changes."""
+
+	def __init__(self, fetch, isRunning=None):
+		# fetch: coroutine function returning a PlaybackInfo
+		self.fetch = fetch
+		self.isRunning = isRunning or (lambda: True)
+		self.maxInterval = 15.0
+		self.state = None
+		# time.monotonic() until the state is trusted
+		self.validUntil = 0.0
+		self.task = None
+		self.listeners = []
+
+	def isActive(self):
+		return self.task is not None and not self.task.done()
+
+	def getState(self):
+		state = self.state
+		if state and self.isActive() and time.monotonic() < self.validUntil:
+			return state
+		return None
+
+	def start(self, service, maxInterval=None):
+		if maxInterval:
+			self.maxInterval = maxInterval
+		if self.isActive():
+			return
+		service.call(self.startTask)
+
+	def startTask(self):
+		if not self.isActive():
+			self.task = asyncio.ensure_future(self.run())
+
+	def stop(self, service=None):
+		self.state = None
+		task = self.task
+		if task is None:
+			return
+		if service is not None:
+			service.call(task.cancel)
+		else:
+			task.cancel()
+
+	def nextInterval(self, state):
+		if state is None:
+			return IDLE_INTERVAL
+		timeToChange = state.timeToChange()
+		if timeToChange is None:
+			return IDLE_INTERVAL
+		if timeToChange > CHANGE_LEAD:
+			# wake up just before the dense window
+			return min(self.maxInterval, timeToChange-CHANGE_LEAD+DENSE_INTERVAL)
+		return DENSE_INTERVAL
+
+	async def run(self):
+		while True:
+			state = None
+			if self.isRunning():
+				try:
+					state = await self.fetch()
+				except asyncio.CancelledError:
+					raise
+				except Exception as e:
+					log.debugWarning("RadioBOSS poll failed: %s"%e)
+			interval = self.nextInterval(state)
+			if state is not None:
+				self.validUntil = state.stamp+interval+GRACE
+				previous, self.state = self.state, state
+				for listener in self.listeners:
+					try:
+						listener(previous, state)
+					except Exception:
+						log.error("RadioBOSS poller listener failed", exc_info=True)
+			else:
+				self.state = None
+			await asyncio.sleep(interval)
@@ -0,0 +1,121 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import io
+import os
+import time
+
+from functools import wraps
+from threading import Lock, Thread, get_ident
+
+# functions listed in the saved statistics
+STATS_LIMIT = 60
+
+_capture = None
+_captureLock = Lock()
+
+
+class ProfileCapture:
+	"""cProfile statistics of the next calls of profiled functions.
+
+	One call is profiled at a time: nested calls are covered by the outer one,
+	calls made meanwhile on other threads run as usual.
+	"""
+
+	def __init__(self, calls, onDone):
+		# loaded only when a capture is asked for
+		import cProfile
+		self.profile = cProfile.Profile()
+		self.wanted = calls
+		self.onDone = onDone
+		self.lock = Lock()
+		# thread of the call being profiled
+		self.owner = None
+		self.calls = 0
+		self.skipped = 0
+		# qualified name -> profiled calls
+		self.names = {}
+		self.started = time.time()
+
+	def run(self, func, args, kwargs):
+		if self.owner == get_ident():
+			return func(*args, **kwargs)
+		if not self.lock.acquire(blocking=False):
+			self.skipped += 1
+			return func(*args, **kwargs)
+		try:
+			self.owner = get_ident()
+			self.profile.enable()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				self.profile.disable()
+				self.calls += 1
+				self.names[func.__qualname__] = self.names.get(func.__qualname__, 0)+1
+		finally:
+			self.owner = None
+			self.lock.release()
+			if self.calls >= self.wanted:
+				finish(self)
+
+	def save(self, folder, extraLines=()):
+		"""Writes a text report and the raw statistics to folder, returning the report path."""
+		import pstats
+		name = time.strftime("radioBossProfile-%Y%m%d-%H%M%S", time.localtime(self.started))
+		path = os.path.join(folder, name)
+		with self.lock:
+			self.profile.dump_stats(path+".prof")
+			out = io.StringIO()
+			stats = pstats.Stats(self.profile, stream=out)
+			stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(STATS_LIMIT)
+		lines = [
+			"RadioBOSS add-on profile, started %s, %.1f seconds"%(
+				time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)), time.time()-self.started
+			),
+			"%d calls profiled, %d concurrent ones not"%(self.calls, self.skipped),
+		]
+		lines.extend("  %s: %d"%item for item in sorted(self.names.items(), key=lambda item: -item[1]))
+		lines.append("")
+		lines.extend(extraLines)
+		lines.append("")
+		lines.append(out.getvalue())
+		with open(path+".txt", "w", encoding="UTF-8") as f:
+			f.write("\n".join(lines))
+		return path+".txt"
+
+
+def isCapturing():
+	return _capture is not None
+
+def start(calls, onDone):
+	"""Profiles the next calls, then passes the ProfileCapture to onDone on a new thread."""
+	global _capture
+	with _captureLock:
+		_capture = ProfileCapture(calls, onDone)
+
+def stop():
+	"""Ends the capture in progress at once, as if it had reached its calls."""
+	capture = _capture
+	if capture is not None:
+		finish(capture)
+
+def finish(capture):
+	global _capture
+	with _captureLock:
+		if _capture is not capture:
+			return
+		_capture = None
+	# writing statistics doesn't delay the call that ended the capture
+	Thread(target=capture.onDone, args=(capture,), daemon=True).start()
+
+def profiled(func):
+	"""Decorator making func one of the calls a capture profiles."""
+	@wraps(func)
+	def wrapper(*args, **kwargs):
+		capture = _capture
+		if capture is None:
+			return func(*args, **kwargs)
+		return capture.run(func, args, kwargs)
+	return wrapper
@@ -0,0 +1,140 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import re
+import unicodedata
+
+from bisect import bisect_left
+from threading import Lock
+
+# track fields looked into by searches
+SEARCH_FIELDS = ("ARTIST", "TITLE", "ALBUM", "TAGS")
+WORD = re.compile(r"\w+")
+# shorter query words are matched as word prefixes only
+TRIGRAM = 3
+
+
+def normalize(text):
+	# case and accent insensitive
+	decomposed = unicodedata.normalize("NFKD", text.casefold())
+	return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+def splitWords(text):
+	return WORD.findall(normalize(text))
+
+def trigrams(word):
+	return {word[i:i+TRIGRAM] for i in range(len(word)-TRIGRAM+1)}
+
+
+class PlaylistIndex:
+	"""Word prefix and trigram index over playlist tracks.
+
+	Tracks are indexed by identity, so rows moved around by a playlist sync
+	only need their positions refreshed, not their words.
+	"""
+
+	def __init__(self):
+		self.lock = Lock()
+		self.clear()
+
+	def clear(self):
+		with self.lock:
+			# id(track) -> words
+			self.words = {}
+			# word -> ids, with the words also kept sorted for prefix lookups
+			self.postings = {}
+			self.vocabulary = []
+			# trigram -> words containing it
+			self.trigrams = {}
+			# id(track) -> 1-based position
+			self.positions = {}
+			self.tracks = []
+
+	def update(self, removed, added, tracks):
+		"""Indexes added tracks, drops removed ones, and takes positions from tracks."""
+		with self.lock:
+			for track in removed:
+				self.remove(id(track))
+			for track in added:
+				self.add(track)
+			self.tracks = tracks
+			self.positions = {id(track): pos for pos, track in enumerate(tracks, 1)}
+
+	def add(self, track):
+		key = id(track)
+		if key in self.words:
+			return
+		words = set()
+		for field in SEARCH_FIELDS:
+			words.update(splitWords(track.get(field) or ""))
+		self.words[key] = words
+		for word in words:
+			ids = self.postings.get(word)
+			if ids is None:
+				ids = self.postings[word] = set()
+				self.vocabulary.insert(bisect_left(self.vocabulary, word), word)
+				for trigram in trigrams(word):
+					self.trigrams.setdefault(trigram, set()).add(word)
+			ids.add(key)
+
+	def remove(self, key):
+		for word in self.words.pop(key, ()):
+			ids = self.postings[word]
+			ids.discard(key)
+			if ids:
+				continue
+			del self.postings[word]
+			del self.vocabulary[bisect_left(self.vocabulary, word)]
+			for trigram in trigrams(word):
+				containing = self.trigrams[trigram]
+				containing.discard(word)
+				if not containing:
+					del self.trigrams[trigram]
+
+	def matchWord(self, part):
+		"""Returns ids of tracks with a word starting with part, and of those only containing it."""
+		prefixed = set()
+		vocabulary = self.vocabulary
+		index = bisect_left(vocabulary, part)
+		while index < len(vocabulary) and vocabulary[index].startswith(part):
+			prefixed |= self.postings[vocabulary[index]]
+			index += 1
+		contained = set()
+		if len(part) >= TRIGRAM:
+			candidates = None
+			for trigram in trigrams(part):
+				words = self.trigrams.get(trigram, ())
+				candidates = set(words) if candidates is None else candidates & words
+				if not candidates:
+					break
+			for word in candidates or ():
+				if part in word and not word.startswith(part):
+					contained |= self.postings[word]
+		return prefixed, contained-prefixed
+
+	def search(self, query, limit=50):
+		"""Returns (pos, track) of tracks matching all query words, word prefixes first."""
+		parts = splitWords(query)
+		if not parts:
+			return []
+		with self.lock:
+			strong = weak = None
+			for part in parts:
+				prefixed, contained = self.matchWord(part)
+				if strong is None:
+					strong, weak = prefixed, contained
+				else:
+					anyMatch = prefixed | contained
+					weak = (weak & anyMatch) | (strong & contained)
+					strong &= prefixed
+				if not strong and not weak:
+					return []
+			positions = self.positions
+			ranked = sorted(strong, key=positions.get)+sorted(weak, key=positions.get)
+			tracks = self.tracks
+			return [(positions[key], tracks[positions[key]-1]) for key in ranked[:limit]]
+
+	def stats(self):
+		return {"tracks": len(self.words), "words": len(self.vocabulary), "trigrams": len(self.trigrams)}
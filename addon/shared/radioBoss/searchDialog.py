@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import addonHandler
+import gui
+import wx
+
+from gui.guiHelper import BoxSizerHelper, ButtonHelper
+
+addonHandler.initTranslation()
+
+class SearchDialog(wx.Dialog):
+	"""Lists playlist rows matching the typed text, calling onChoice with the chosen position."""
+
+	def __init__(self, title, search, onChoice):
+		super().__init__(None, title=title)
+		self.search = search
+		self.onChoice = onChoice
+		self.positions = []
+		helperSizer = BoxSizerHelper(self, wx.VERTICAL)
+		# Translators: label of the search field in the playlist search dialog
+		self.queryEdit = helperSizer.addLabeledControl(_("Artist, title, album or tags:"), wx.TextCtrl)
+		# Translators: label of the result list in the playlist search dialog
+		self.resultList = helperSizer.addLabeledControl(_("Matching tracks:"), wx.ListBox, size=(400, 250))
+		buttonHelper = ButtonHelper(wx.HORIZONTAL)
+		# Translators: button to move to the chosen track in the playlist search dialog
+		goButton = buttonHelper.addButton(self, id=wx.ID_OK, label=_("&Go to track"))
+		goButton.SetDefault()
+		buttonHelper.addButton(self, id=wx.ID_CANCEL)
+		helperSizer.addDialogDismissButtons(buttonHelper)
+		mainSizer = wx.BoxSizer(wx.VERTICAL)
+		mainSizer.Add(helperSizer.sizer, border=10, flag=wx.ALL)
+		mainSizer.Fit(self)
+		self.SetSizer(mainSizer)
+		self.queryEdit.Bind(wx.EVT_TEXT, self.onQuery)
+		self.resultList.Bind(wx.EVT_LISTBOX_DCLICK, self.onGo)
+		self.Bind(wx.EVT_BUTTON, self.onGo, id=wx.ID_OK)
+		self.Bind(wx.EVT_BUTTON, lambda event: self.Destroy(), id=wx.ID_CANCEL)
+		self.Bind(wx.EVT_CHAR_HOOK, self.onEscape)
+		self.queryEdit.SetFocus()
+
+	def onQuery(self, event):
+		results = self.search(self.queryEdit.GetValue())
+		self.positions = [pos for pos, track in results]
+		choices = ["%d. %s - %s"%(pos, track.get("ARTIST"), track.get("TITLE")) for pos, track in results]
+		self.resultList.Set(choices)
+		if choices:
+			self.resultList.SetSelection(0)
+
+	def onGo(self, event):
+		index = self.resultList.GetSelection()
+		if index == wx.NOT_FOUND:
+			return
+		pos = self.positions[index]
+		self.Destroy()
+		# focus can move only once the dialog is gone
+		wx.CallAfter(self.onChoice, pos)
+
+	def onEscape(self, event):
+		if event.GetKeyCode() == wx.WXK_ESCAPE:
+			self.Destroy()
+		else:
+			event.Skip()
+
+	@classmethod
+	def Run(cls, title, search, onChoice):
+		gui.mainFrame.prePopup()
+		d = cls(title, search, onChoice)
+		if d:
+			d.Show()
+		gui.mainFrame.postPopup()
@@ -0,0 +1,219 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS app module
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+import json
+import time
+
+from logHandler import log
+from threading import Lock
+
+from .constants import TrackDetails
+from .models import Track
+
+try:
+	import sqlite3
+except ImportError:
+	sqlite3 = None
+
+# bumped when the tables change, dropping what older versions stored
+SCHEMA_VERSION = 1
+SCHEMA = (
+	"CREATE TABLE IF NOT EXISTS tracks (filename TEXT PRIMARY KEY, data TEXT NOT NULL, stamp REAL NOT NULL, used REAL NOT NULL)",
+	"CREATE TABLE IF NOT EXISTS rows (fingerprint TEXT PRIMARY KEY, filename TEXT NOT NULL)",
+	"CREATE INDEX IF NOT EXISTS tracksUsed ON tracks (used)",
+)
+# share of the size cap kept by each eviction, so it doesn't run at every flush
+EVICTION_TARGET = 0.9
+# row texts kept per stored track, on average
+ROWS_PER_TRACK = 2
+DAY = 86400
+# details RadioBOSS changes as tracks play or get rated, never answered from disk
+CHANGING_DETAILS = frozenset((
+	TrackDetails.PLAYCOUNT, TrackDetails.LASTPLAYED, TrackDetails.RATING, TrackDetails.LISTENERS,
+))
+
+
+def canAnswer(details):
+	"""Tells if the store may answer a lookup reading only these details."""
+	return bool(details) and CHANGING_DETAILS.isdisjoint(details)
+
+
+class TrackStore:
+	"""Track details kept on disk across NVDA restarts, in a sqlite database.
+
+	Tracks are stored by FILENAME, and playlist row texts point to them,
+	so a row read again with the same text is answered without RadioBOSS.
+	The database is never opened by get: the first read asks onClosed to run open
+	in background, and misses until then. Writes are queued and done by flush,
+	which onPending is asked to schedule whenever the queue stops being empty.
+	Reads have their own connection, so they don't wait for a flush in progress.
+	"""
+
+	def __init__(self, getPath, onPending=None, onClosed=None):
+		self.getPath = getPath
+		self.onPending = onPending or (lambda: None)
+		self.onClosed = onClosed or self.open
+		# guards pending and touched
+		self.lock = Lock()
+		self.writeLock = Lock()
+		self.readLock = Lock()
+		self.connection = None
+		self.reader = None
+		self.opening = False
+		self.failed = False
+		# fingerprint -> track, waiting to be written
+		self.pending = {}
+		# tracks of the flush in progress
+		self.writing = {}
+		# filenames read, whose last use is written at next flush
+		self.touched = set()
+		self.hits = self.misses = self.writes = 0
+
+	def isAvailable(self):
+		return sqlite3 is not None and not self.failed
+
+	def open(self):
+		"""Opens the database, returning the writing connection."""
+		with self.writeLock:
+			return self.openWriter()
+
+	def openWriter(self):
+		# writeLock held by callers
+		if self.connection is not None or not self.isAvailable():
+			return self.connection
+		try:
+			connection = sqlite3.connect(self.getPath(), check_same_thread=False)
+			connection.execute("PRAGMA journal_mode=WAL")
+			if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+				connection.executescript("DROP TABLE IF EXISTS tracks; DROP TABLE IF EXISTS rows;")
+				connection.execute("PRAGMA user_version=%d"%SCHEMA_VERSION)
+			for statement in SCHEMA:
+				connection.execute(statement)
+			connection.commit()
+			reader = sqlite3.connect(self.getPath(), check_same_thread=False)
+			reader.execute("PRAGMA query_only=1")
+		except Exception:
+			log.error("RadioBOSS track store unavailable", exc_info=True)
+			self.failed = True
+			return None
+		finally:
+			self.opening = False
+		self.connection = connection
+		self.reader = reader
+		return connection
+
+	def get(self, fingerprint, maxAge):
+		"""Returns the track last seen in the row with this text, if not older than maxAge days."""
+		track = self.pending.get(fingerprint) or self.writing.get(fingerprint)
+		if track is not None:
+			return track
+		reader = self.reader
+		if reader is None:
+			if not self.opening and self.isAvailable():
+				self.opening = True
+				self.onClosed()
+			return None
+		with self.readLock:
+			try:
+				row = reader.execute(
+					"SELECT tracks.filename, data FROM rows JOIN tracks USING (filename) WHERE fingerprint=? AND stamp>?",
+					(fingerprint, time.time()-maxAge*DAY)
+				).fetchone()
+			except sqlite3.Error:
+				log.debugWarning("RadioBOSS track store read failed", exc_info=True)
+				return None
+		if row is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		with self.lock:
+			self.touched.add(row[0])
+		return Track.fromAttrs(json.loads(row[1]))
+
+	def put(self, fingerprint, track):
+		if not self.isAvailable() or not track.get("FILENAME"):
+			return
+		with self.lock:
+			wasEmpty = not self.pending
+			self.pending[fingerprint] = track
+		if wasEmpty:
+			self.onPending()
+
+	def flush(self, maxSize):
+		"""Writes queued tracks in one transaction, then trims the store to maxSize tracks."""
+		with self.writeLock:
+			with self.lock:
+				pending, self.pending = self.pending, {}
+				touched, self.touched = self.touched, set()
+			if not pending and not touched:
+				return
+			connection = self.openWriter()
+			if connection is None:
+				return
+			now = time.time()
+			tracks = {track["FILENAME"]: track for track in pending.values()}
+			self.writing = pending
+			try:
+				with connection:
+					connection.executemany(
+						"INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?)",
+						[
+							(filename, json.dumps({
+								key: value for key, value in track.items() if value and key not in CHANGING_DETAILS
+							}), now, now)
+							for filename, track in tracks.items()
+						]
+					)
+					connection.executemany(
+						"INSERT OR REPLACE INTO rows VALUES (?, ?)",
+						[(fingerprint, track["FILENAME"]) for fingerprint, track in pending.items()]
+					)
+					connection.executemany(
+						"UPDATE tracks SET used=? WHERE filename=?",
+						[(now, filename) for filename in touched-tracks.keys()]
+					)
+					self.evict(connection, maxSize)
+			except sqlite3.Error:
+				log.debugWarning("RadioBOSS track store write failed", exc_info=True)
+				return
+			finally:
+				self.writing = {}
+			self.writes += len(pending)
+
+	def evict(self, connection, maxSize):
+		keep = int(maxSize*EVICTION_TARGET)
+		count = connection.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+		if count > maxSize:
+			connection.execute(
+				"DELETE FROM tracks WHERE filename IN (SELECT filename FROM tracks ORDER BY used, rowid LIMIT ?)",
+				(count-keep,)
+			)
+			connection.execute("DELETE FROM rows WHERE filename NOT IN (SELECT filename FROM tracks)")
+		# a track gets a row text for each position it had, so rows are capped too
+		count = connection.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+		if count > ROWS_PER_TRACK*maxSize:
+			# rewritten rows get a new rowid, so the lowest ones are the oldest
+			connection.execute(
+				"DELETE FROM rows WHERE rowid IN (SELECT rowid FROM rows ORDER BY rowid LIMIT ?)",
+				(count-ROWS_PER_TRACK*keep,)
+			)
+
+	def close(self, maxSize):
+		self.flush(maxSize)
+		with self.writeLock, self.readLock:
+			if self.connection is not None:
+				self.connection.close()
+				self.reader.close()
+				self.connection = self.reader = None
+
+	def stats(self):
+		total = self.hits+self.misses
+		return {
+			"hits": self.hits,
+			"misses": self.misses,
+			"hitRate": self.hits/total if total else 0.0,
+			"writes": self.writes,
+			"pending": len(self.pending),
+		}
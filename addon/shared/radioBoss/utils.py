@@ -25,3 +25,13 @@ def fixedTime(millis):
 	res = time.strftime(timeTemplate, time.gmtime(seconds))
 	return res
 
+def parseDuration(text):
+	"""Returns milliseconds from a RadioBOSS duration, either [hh:]mm:ss or milliseconds."""
+	if not text:
+		return 0
+	if ":" not in text:
+		return int(text)
+	seconds = 0
+	for part in text.split(":"):
+		seconds = seconds*60+float(part)
+	return int(seconds*1000)
@@ -3,23 +3,156 @@
 # Copyright (C) 2024 Alberto Buffolino
 # Released under GPL 2
 
-from xml.etree import ElementTree
+import re
+
+from xml.parsers import expat
 from multipledispatch import dispatch
 
-@dispatch(str, str)
+ENCODING_DECL = re.compile(rb"""^\s*<\?xml[^>]*encoding=["']([A-Za-z0-9._-]+)["']""")
+TAG_END = frozenset(b" \t\r\n/>")
+
+
+class _Found(Exception):
+	pass
+
+
+def getEncoding(info):
+	match = ENCODING_DECL.match(info, 0, 200)
+	return match.group(1).decode("ascii") if match else "UTF-8"
+
+def findTag(info, name, start):
+	# "<" can't appear unescaped in attribute values or text,
+	# so in RadioBOSS responses (no comments nor CDATA) it always starts a tag
+	needle = b"<"+name
+	while True:
+		start = info.find(needle, start)
+		if start < 0:
+			return start
+		end = start+len(needle)
+		if end < len(info) and info[end] in TAG_END:
+			return start
+		start = end
+
+def seek(info, names):
+	"""Returns the offset of the start tag at path names, -1 if missing, None if it can't be told."""
+	start = 0
+	for depth, name in enumerate(names):
+		start = findTag(info, name, start)
+		if start < 0 or depth == len(names)-1:
+			return start
+		# only attribute-less containers can be skipped over safely
+		after = info[start+len(name)+1]
+		if after == ord('/'):
+			return -1
+		if after != ord('>'):
+			return None
+		childStart = findTag(info, names[depth+1], start)
+		closing = info.find(b"</"+name, start)
+		if childStart < 0 or 0 <= closing < childStart:
+			return -1
+	return start
+
+def readElement(info, offset, encoding):
+	res = []
+	def start(name, attrs):
+		res.append(attrs)
+		raise _Found
+	parser = expat.ParserCreate(encoding)
+	parser.StartElementHandler = start
+	try:
+		parser.Parse(memoryview(info)[offset:], True)
+	except _Found:
+		pass
+	return res[0] if res else None
+
+def stream(info, wanted, found, encoding=None):
+	# full single pass, stopping as soon as all wanted paths are seen
+	stack = []
+	missing = set(wanted.values())
+	def start(name, attrs):
+		stack.append(name)
+		tag = wanted.get(tuple(stack[1:]))
+		if tag in missing:
+			found[tag] = attrs
+			missing.discard(tag)
+			if not missing:
+				raise _Found
+	def end(name):
+		stack.pop()
+	parser = expat.ParserCreate(encoding)
+	parser.StartElementHandler = start
+	parser.EndElementHandler = end
+	try:
+		parser.Parse(info, True)
+	except _Found:
+		pass
+
+def extract(info, tags) -> dict[str, dict[str, str]]:
+	"""Returns attributes of the first element found at each tag, without building a tree.
+
+	Tags are paths from the root, like ".CurrentTrack/TRACK".
+	Each element is read by seeking straight to its start tag in the raw bytes,
+	falling back to an expat pass over the document when the layout doesn't allow it.
+	"""
+	# overrides any declaration once text is encoded here
+	override = None
+	if isinstance(info, str):
+		info = info.encode("UTF-8")
+		encoding = override = "UTF-8"
+	else:
+		encoding = getEncoding(info)
+	wanted = {tuple(tag.lstrip('.').strip('/').split('/')): tag for tag in tags}
+	found = {}
+	# byte seeking needs an ASCII compatible encoding
+	if not encoding.upper().startswith("UTF-16") and not info.startswith((b"\xff\xfe", b"\xfe\xff")):
+		for names, tag in list(wanted.items()):
+			offset = seek(info, [name.encode("ascii") for name in names])
+			if offset is None:
+				continue
+			if offset >= 0:
+				attrs = readElement(info, offset, encoding)
+				if attrs is not None:
+					found[tag] = attrs
+			del wanted[names]
+	if wanted:
+		stream(info, wanted, found, override)
+	return found
+
+def findAll(info, tag) -> list[dict[str, str]]:
+	"""Returns attributes of every element at tag, in document order, in one expat pass."""
+	override = None
+	if isinstance(info, str):
+		info = info.encode("UTF-8")
+		override = "UTF-8"
+	names = tuple(tag.lstrip('.').strip('/').split('/'))
+	stack = []
+	res = []
+	def start(name, attrs):
+		stack.append(name)
+		if len(stack) == len(names)+1 and tuple(stack[1:]) == names:
+			res.append(attrs)
+	def end(name):
+		stack.pop()
+	parser = expat.ParserCreate(override)
+	parser.StartElementHandler = start
+	parser.EndElementHandler = end
+	parser.Parse(info, True)
+	return res
+
+@dispatch((str, bytes), str)
 def parse(info, tag) -> dict[str, str]:
-	parsedInfo = ElementTree.fromstring(info)
-	parsedTag = parsedInfo.find(tag)
-	res = parsedTag.attrib
+	res = extract(info, (tag,)).get(tag)
+	if res is None:
+		raise KeyError(tag)
 	return res
 
-@dispatch(str, str, str)
+@dispatch((str, bytes), str, str)
 def parse(info, tag, attr) -> str:
 	parsedTag = parse(info, tag)
 	res = parsedTag.get(attr)
 	return res
 
-@dispatch(str, str, tuple)
+@dispatch((str, bytes), str, tuple)
 def parse(info, tag, attrs) -> dict[str, str]:
 	parsedTag = parse(info, tag)
 	res = {}
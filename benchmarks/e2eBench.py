@@ -0,0 +1,231 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS add-on benchmarks
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+# Drives each apiUtils entry point headless against stubServer.py,
+# reporting throughput and latency percentiles per call.
+# Every scenario runs cold, with all caches dropped before each call,
+# and warm, with the default caching of repeated calls.
+# Results saved with --output can be checked by a later run with --compare,
+# which fails when a median got slower than --tolerance allows.
+# Usage: python benchmarks/e2eBench.py [--calls N] [--threads N] [--latency MS] [--output FILE] [--compare FILE]
+
+import argparse
+import ast
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import nvdaStubs
+import payloads
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+# playlist rows asked about are after the current one
+PLAYLIST_POS = 10
+# median differences below these milliseconds are noise
+NOISE_MS = 0.05
+MODES = ("cold", "warm")
+# options that change what is measured, so results compare only when equal
+WORKLOAD_OPTIONS = ("calls", "warmup", "threads", "latency", "jitter", "size", "rows", "set")
+
+def withPlaylist(func):
+	# the first call only starts loading the playlist copy: wait for it and call again, as a user would
+	def run(api, row):
+		res = func(api, row)
+		future = api._playlistSync
+		if not api.playlist.isLoaded() and future is not None:
+			future.exception()
+			res = func(api, row)
+		return res
+	return run
+
+# name -> function of apiUtils and of a playlist row after the current one
+SCENARIOS = {
+	"mic": lambda api, row: api.getMicStatus(),
+	"elapsed time": lambda api, row: api.getSongElapsedTime(),
+	"remaining time": lambda api, row: api.getSongRemainingTime(),
+	"playlist remaining": lambda api, row: api.getPlaylistRemainingTime(),
+	"current title": lambda api, row: api.getCurrentTrackInfo("TITLE"),
+	"next summary": lambda api, row: api.formatTrackSummary(api.getPlaybackTrackInfo("next", ("ARTIST", "TITLE"))),
+	"row detail": lambda api, row: api.getPosTrackInfo(row, "ARTIST"),
+	"row info": lambda api, row: api.getFullPosTrackInfo(row),
+	"ten rows": lambda api, row: list(api.iterPosTrackInfo(range(row, row+10))),
+	"time to row": withPlaylist(lambda api, row: api.getTimeToPosTrack(row)),
+	"search": withPlaylist(lambda api, row: (api.preparePlaylistSearch(), api.searchPlaylist("title %d"%row))),
+}
+# settings the scenario needs, whatever --set says: these only work on the playlist copy
+SCENARIO_SETTINGS = {
+	"time to row": {"playlistMirror": True},
+	"search": {"playlistMirror": True},
+}
+
+def clearCaches(api):
+	api.playbackCache.clear()
+	api.trackCache.clear()
+	# also cancels a playlist load in progress
+	api.dropPlaylist()
+	api.clock.invalidate()
+
+def startServer(args):
+	command = [
+		sys.executable, os.path.join(BENCHMARKS, "stubServer.py"), "--port", "0",
+		"--latency", str(args.latency), "--jitter", str(args.jitter), "--size", args.size, "--rows", str(args.rows),
+	]
+	# its own interpreter, so serving answers doesn't compete with the add-on for the GIL
+	server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+	port = int(server.stdout.readline().split()[-1])
+	return server, port
+
+def parseSetting(text):
+	key, value = text.split("=", 1)
+	try:
+		return key, ast.literal_eval(value)
+	except (ValueError, SyntaxError):
+		return key, value
+
+def percentile(samples, percent):
+	# nearest rank on sorted samples
+	return samples[min(len(samples)-1, int(len(samples)*percent/100))]
+
+def runScenario(api, log, func, mode, args):
+	latencies = []
+	# rows cycle through the playlist, leaving room for ten rows ahead
+	rows = range(PLAYLIST_POS+1, max(PLAYLIST_POS+2, args.rows-10))
+	def runCall(call):
+		if mode == "cold":
+			clearCaches(api)
+		start = time.perf_counter()
+		func(api, rows[call%len(rows)])
+		latencies.append(time.perf_counter()-start)
+	for call in range(args.warmup):
+		func(api, rows[call%len(rows)])
+	api.metrics.reset()
+	errors = log.errors
+	start = time.perf_counter()
+	if args.threads == 1 or mode == "cold":
+		for call in range(args.calls):
+			runCall(call)
+	else:
+		with ThreadPoolExecutor(args.threads) as executor:
+			list(executor.map(runCall, range(args.calls)))
+	wall = time.perf_counter()-start
+	latencies = sorted(latency*1000 for latency in latencies)
+	snapshot = api.metrics.snapshot()
+	return {
+		"calls": len(latencies),
+		"errors": log.errors-errors,
+		"throughput": len(latencies)/wall,
+		"mean": statistics.fmean(latencies),
+		"p50": percentile(latencies, 50),
+		"p95": percentile(latencies, 95),
+		"p99": percentile(latencies, 99),
+		"max": latencies[-1],
+		"requests": sum(data["counters"].get("requests", 0) for data in snapshot.values())/len(latencies),
+		# per action and stage, from the add-on's own metrics
+		"stages": {label: data["stages"] for label, data in snapshot.items() if data["stages"]},
+	}
+
+def getCommit():
+	try:
+		return subprocess.run(
+			["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BENCHMARKS
+		).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+def compare(results, options, baseline, tolerance):
+	"""Prints median changes against baseline results, returning the regressed keys."""
+	regressions = []
+	for option in WORKLOAD_OPTIONS:
+		if baseline["options"].get(option) != options[option]:
+			print("warning: baseline ran with %s %s, not %s"%(option, baseline["options"].get(option), options[option]))
+	print("\n%-28s %10s %10s %8s"%("against " + (baseline["commit"] or "baseline"), "was p50", "now p50", "change"))
+	for key, res in results.items():
+		old = baseline["results"].get(key)
+		if old is None:
+			continue
+		change = (res["p50"]-old["p50"])/old["p50"]*100 if old["p50"] else 0.0
+		regressed = change > tolerance and res["p50"]-old["p50"] > NOISE_MS
+		if regressed:
+			regressions.append(key)
+		print("%-28s %10.3f %10.3f %+7.1f%%%s"%(key, old["p50"], res["p50"], change, " REGRESSED" if regressed else ""))
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--calls", type=int, default=200, help="measured calls per scenario and mode")
+	parser.add_argument("--warmup", type=int, default=5, help="unmeasured calls before each run")
+	parser.add_argument("--threads", type=int, default=1, help="threads calling at once, in warm runs only")
+	parser.add_argument("--latency", type=float, default=0, help="milliseconds the server takes to answer")
+	parser.add_argument("--jitter", type=float, default=0, help="milliseconds the latency varies by")
+	parser.add_argument("--size", choices=payloads.SIZES, default="typical", help="track payload size")
+	parser.add_argument("--rows", type=int, default=500, help="playlist length")
+	parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="add-on setting, repeatable")
+	parser.add_argument("--only", action="append", choices=SCENARIOS, help="run only this scenario, repeatable")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	parser.add_argument("--output", help="save results as JSON to this file")
+	parser.add_argument("--compare", metavar="FILE", help="results saved by an earlier run")
+	parser.add_argument("--tolerance", type=float, default=20, help="percent a median may grow before failing")
+	args = parser.parse_args()
+	server, port = startServer(args)
+	settings = {
+		"host": "127.0.0.1", "port": port, "protocol": "http",
+		# measured without disk writes, with stages recorded
+		"persistentCache": False, "collectMetrics": True,
+	}
+	settings.update(parseSetting(text) for text in args.set)
+	log = nvdaStubs.install(settings)
+	from radioBoss import apiUtils
+	results = {}
+	try:
+		for name, func in SCENARIOS.items():
+			if args.only and name not in args.only:
+				continue
+			saved = {key: apiUtils.addonConfig[key] for key in SCENARIO_SETTINGS.get(name, {})}
+			apiUtils.addonConfig.update(SCENARIO_SETTINGS.get(name, {}))
+			try:
+				for mode in MODES:
+					results["%s/%s"%(name, mode)] = runScenario(apiUtils, log, func, mode, args)
+			finally:
+				apiUtils.addonConfig.update(saved)
+				clearCaches(apiUtils)
+	finally:
+		apiUtils.terminate()
+		server.terminate()
+		server.wait()
+	report = {
+		"commit": getCommit(),
+		"python": platform.python_version(),
+		"options": vars(args),
+		"results": results,
+	}
+	if args.json:
+		print(json.dumps(report, indent=1))
+	else:
+		print("%-28s %8s %9s %8s %8s %8s %8s %6s %6s"%(
+			"scenario", "calls/s", "mean ms", "p50", "p95", "p99", "max", "req", "errors"
+		))
+		for key, res in results.items():
+			print("%-28s %8.0f %9.3f %8.3f %8.3f %8.3f %8.3f %6.2f %6d"%(
+				key, res["throughput"], res["mean"], res["p50"], res["p95"], res["p99"], res["max"],
+				res["requests"], res["errors"]
+			))
+	if args.output:
+		with open(args.output, "w", encoding="UTF-8") as f:
+			json.dump(report, f, indent=1)
+	failed = any(res["errors"] for res in results.values())
+	if args.compare:
+		with open(args.compare, encoding="UTF-8") as f:
+			baseline = json.load(f)
+		failed = compare(results, vars(args), baseline, args.tolerance) or failed
+	return 1 if failed else 0
+
+if __name__ == "__main__":
+	sys.exit(main())
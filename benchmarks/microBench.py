@@ -0,0 +1,126 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS add-on benchmarks
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+# Times the in-process hot path, call by call: xmlParser.parse overloads,
+# the multipledispatch lookup alone, PlaybackInfo building, utils formatting
+# and the track summary assembly, on payloads from tiny to lyrics-heavy.
+# Each run is checked against a stored baseline, kept per machine;
+# --save records the current numbers as the new baseline.
+# Usage: python benchmarks/microBench.py [--only TEXT] [--save] [--baseline FILE] [--tolerance PCT]
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+import nvdaStubs
+import payloads
+
+nvdaStubs.install()
+
+from multipledispatch import Dispatcher  # NOQA: E402
+from radioBoss import apiUtils, models, utils, xmlParser  # NOQA: E402
+from radioBoss.constants import TrackDetails, XPaths  # NOQA: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "microBench.json")
+DETAILS = tuple(TrackDetails)
+SUMMARY = ("Artist", "Title")
+REPEAT = 5
+# seconds each timing run lasts at least
+MIN_TIME = 0.05
+
+def noop(*args):
+	pass
+
+def getDispatcher():
+	# same signatures as xmlParser.parse, with nothing behind them
+	dispatcher = Dispatcher("parse")
+	for signature in xmlParser.parse.funcs:
+		dispatcher.add(signature, noop)
+	return dispatcher
+
+def trackSummary(track):
+	# what script_*TrackSummary does once the track is at hand
+	details = [detail.upper() for detail in SUMMARY]
+	return apiUtils.formatTrackSummary({detail: track.get(detail) for detail in details})
+
+def getCases():
+	"""Returns {name: (func, args)}."""
+	cases = {}
+	dispatcher = getDispatcher()
+	cases["dispatch/direct call"] = (noop, (b"", XPaths.PLAYBACK))
+	cases["dispatch/tag"] = (dispatcher, (b"", XPaths.PLAYBACK))
+	cases["dispatch/tag, attr"] = (dispatcher, (b"", XPaths.PLAYBACK, "pos"))
+	cases["dispatch/tag, attrs"] = (dispatcher, (b"", XPaths.PLAYBACK, DETAILS))
+	for size in payloads.SIZES:
+		info = payloads.playbackInfo(size)
+		cases["parse/%s/tag"%size] = (xmlParser.parse, (info, XPaths.CURRENT_TRACK))
+		cases["parse/%s/tag, attr"%size] = (xmlParser.parse, (info, XPaths.PLAYBACK, "pos"))
+		cases["parse/%s/tag, attrs"%size] = (xmlParser.parse, (info, XPaths.NEXT_TRACK, DETAILS))
+		cases["parse/%s/playbackinfo"%size] = (models.PlaybackInfo.fromResponse, (info,))
+	cases["utils/fixedTime minutes"] = (utils.fixedTime, ("754000",))
+	cases["utils/fixedTime hours"] = (utils.fixedTime, ("7512000",))
+	cases["utils/decodeBase64String"] = (utils.decodeBase64String, (utils.encodeBase64String("radioBossPassword"),))
+	track = models.Track.fromAttrs(payloads.trackAttrs(10))
+	cases["summary/two details"] = (trackSummary, (track,))
+	cases["summary/all details"] = (apiUtils.formatTrackSummary, ({detail: track.get(detail) for detail in DETAILS},))
+	return cases
+
+def measure(func, args):
+	"""Returns the best nanoseconds per call."""
+	timer = timeit.Timer(lambda: func(*args))
+	number, elapsed = timer.autorange()
+	number = max(number, int(number*MIN_TIME/elapsed))
+	return min(timer.repeat(REPEAT, number))/number*1e9
+
+def getMachine():
+	return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()}
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--only", help="run only cases whose name contains this text")
+	parser.add_argument("--baseline", default=BASELINE, help="baseline file")
+	parser.add_argument("--save", action="store_true", help="store results as the baseline")
+	parser.add_argument("--tolerance", type=float, default=25, help="percent a case may slow down before failing")
+	args = parser.parse_args()
+	baseline = None
+	if os.path.exists(args.baseline):
+		with open(args.baseline, encoding="UTF-8") as f:
+			baseline = json.load(f)
+		if baseline["machine"] != getMachine():
+			print("warning: baseline recorded on %s"%baseline["machine"])
+	results = {}
+	regressions = []
+	print("%-36s %12s %12s %8s"%("case", "ns/call", "baseline", "change"))
+	for name, (func, callArgs) in getCases().items():
+		if args.only and args.only not in name:
+			continue
+		ns = results[name] = measure(func, callArgs)
+		old = baseline["results"].get(name) if baseline else None
+		if old is None:
+			print("%-36s %12.0f"%(name, ns))
+			continue
+		change = (ns-old)/old*100
+		regressed = change > args.tolerance
+		if regressed:
+			regressions.append(name)
+		print("%-36s %12.0f %12.0f %+7.1f%%%s"%(name, ns, old, change, " REGRESSED" if regressed else ""))
+	if args.save:
+		if baseline and args.only:
+			# a partial run updates its cases only
+			baseline["results"].update(results)
+			results = baseline["results"]
+		os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+		with open(args.baseline, "w", encoding="UTF-8") as f:
+			json.dump({"machine": getMachine(), "results": results}, f, indent=1)
+		print("baseline saved to %s"%args.baseline)
+	elif regressions:
+		return 1
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,95 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS add-on benchmarks
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+# Minimal stand-ins for the NVDA modules imported by the shared package,
+# so it runs headless. The add-on config answers with its confspec defaults.
+
+import builtins
+import re
+import sys
+import tempfile
+import types
+
+ADDON_NAME = "radioBoss"
+
+def specDefault(spec):
+	if isinstance(spec, dict):
+		return Section(spec)
+	kind = spec.split("(")[0]
+	value = re.search(r"default=(list\([^)]*\)|[^,)]*)", spec).group(1)
+	if kind == "boolean":
+		return value == "True"
+	if kind == "integer":
+		return int(value)
+	if kind == "float":
+		return float(value)
+	if kind == "string_list":
+		return re.findall(r'"([^"]*)"', value)
+	return value.strip("'")
+
+
+class Section(dict):
+	# answers with the confspec default, like configobj does
+
+	def __init__(self, spec):
+		super().__init__()
+		self.spec = spec
+
+	def __missing__(self, key):
+		return self.setdefault(key, specDefault(self.spec[key]))
+
+
+class Conf(dict):
+
+	def __init__(self, settings):
+		super().__init__()
+		self.spec = {}
+		self.settings = settings
+
+	def __missing__(self, key):
+		section = self.setdefault(key, Section(self.spec[key]))
+		if key == ADDON_NAME:
+			section.update(self.settings)
+		return section
+
+
+class Log:
+	"""Drops messages, counting errors so callers can tell failed answers."""
+
+	def __init__(self):
+		self.errors = 0
+
+	def error(self, *args, **kwargs):
+		self.errors += 1
+
+	def __getattr__(self, name):
+		return lambda *args, **kwargs: None
+
+
+class Addon:
+	manifest = {"name": ADDON_NAME, "summary": "RadioBOSS"}
+
+
+def fakeModule(name, **attrs):
+	module = types.ModuleType(name)
+	module.__dict__.update(attrs)
+	sys.modules[name] = module
+	return module
+
+def install(settings=None, configPath=None):
+	"""Registers the stand-ins, with settings overriding add-on config defaults. Returns the log."""
+	log = Log()
+	builtins._ = lambda text: text
+	fakeModule("addonHandler", getCodeAddon=Addon, initTranslation=lambda: None)
+	fakeModule("config", conf=Conf(settings or {}))
+	fakeModule("logHandler", log=log)
+	fakeModule("globalVars", appArgs=types.SimpleNamespace(
+		secure=False, configPath=configPath or tempfile.gettempdir()
+	))
+	# GUI modules are already loaded at NVDA launch, nothing here needs them working
+	fakeModule("gui")
+	fakeModule("gui.guiHelper", BoxSizerHelper=object, ButtonHelper=object)
+	fakeModule("wx", Dialog=object)
+	return log
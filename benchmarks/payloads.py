@@ -0,0 +1,93 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS add-on benchmarks
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+# Synthetic RadioBOSS API responses, shaped like real playbackinfo/trackinfo documents.
+
+import os
+import sys
+
+from xml.sax.saxutils import quoteattr
+
+# make the add-on shared modules importable
+SHARED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "addon", "shared")
+if SHARED not in sys.path:
+	sys.path.insert(0, SHARED)
+
+LYRICS_LINE = "And the night goes on, the radio plays our song again"
+
+# name -> (lyrics lines, comment chars)
+SIZES = {
+	"tiny": (0, 0),
+	"typical": (0, 80),
+	"lyrics": (60, 400),
+	"huge": (400, 4000),
+}
+
+def trackAttrs(index, lyricsLines=0, commentChars=0):
+	artist = "Artist %d"%index
+	title = "Title %d"%index
+	return {
+		"ARTIST": artist,
+		"TITLE": title,
+		"ALBUM": "Album %d"%(index//10),
+		"YEAR": str(1970+index%50),
+		"GENRE": "Pop",
+		"COMMENT": ("c"*commentChars),
+		"FILENAME": "D:\\Music\\%s\\%s.mp3"%(artist, title),
+		"DURATION": str(180000+index*1000%60000),
+		"PLAYCOUNT": str(index%25),
+		"LASTPLAYED": "2024-05-01 10:%02d:00"%(index%60),
+		"INTRO": "0",
+		"OUTRO": "0",
+		"LANGUAGE": "English",
+		"RATING": str(index%6),
+		"BPM": str(90+index%60),
+		"TAGS": "rock;80s;fast" if index%2 else "ballad;slow",
+		"PUBLISHER": "Label",
+		"ALBUMARTIST": artist,
+		"COMPOSER": "Composer %d"%index,
+		"COPYRIGHT": "",
+		"TRACKNUMBER": str(index%12+1),
+		"F1": "",
+		"F2": "",
+		"F3": "",
+		"F4": "",
+		"F5": "",
+		"CASTTITLE": "%s - %s"%(artist, title),
+		"LISTENERS": "12",
+		"LYRICS": "\n".join([LYRICS_LINE]*lyricsLines),
+		"ITEMTITLE": "%s - %s"%(artist, title),
+	}
+
+def trackElement(attrs):
+	return "<TRACK %s/>"%" ".join("%s=%s"%(k, quoteattr(v)) for k, v in attrs.items())
+
+def playbackInfo(size="typical", index=10, pos=60000, length=180000, playingTimeLeft=3600000, state="play"):
+	lyricsLines, commentChars = SIZES[size]
+	tracks = []
+	for tag, trackIndex in (("CurrentTrack", index), ("PrevTrack", index-1), ("NextTrack", index+1)):
+		track = trackElement(trackAttrs(trackIndex, lyricsLines, commentChars))
+		tracks.append("<{tag}>{track}</{tag}>".format(tag=tag, track=track))
+	playback = (
+		'<Playback playlistpos="%d" streams="0" netstream="0" pos="%d" len="%d" state="%s" playingtimeleft="%d"/>'
+	)%(index, pos, length, state, playingTimeLeft)
+	doc = '<?xml version="1.0" encoding="UTF-8"?><Info>%s%s<Streaming listeners="12"/></Info>'%("".join(tracks), playback)
+	return doc.encode("UTF-8")
+
+def trackInfo(index, size="typical"):
+	lyricsLines, commentChars = SIZES[size]
+	track = trackElement(trackAttrs(index, lyricsLines, commentChars))
+	doc = '<?xml version="1.0" encoding="UTF-8"?><Info><Track>%s</Track></Info>'%track
+	return doc.encode("UTF-8")
+
+def trackDuration(index):
+	return int(trackAttrs(index)["DURATION"])
+
+def playlist(rows, size="typical"):
+	# getplaylist2 answer: one TRACK per row, positions 1 to rows
+	lyricsLines, commentChars = SIZES[size]
+	tracks = "".join(trackElement(trackAttrs(index, lyricsLines, commentChars)) for index in range(1, rows+1))
+	doc = '<?xml version="1.0" encoding="UTF-8"?><Playlist>%s</Playlist>'%tracks
+	return doc.encode("UTF-8")
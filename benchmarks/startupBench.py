@@ -0,0 +1,132 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS add-on benchmarks
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+# Measures what the add-on costs at NVDA launch and RadioBOSS app module load,
+# against what is deferred to the first API call.
+# Each scenario runs in a fresh interpreter, with minimal stand-ins
+# for the NVDA modules the shared package imports. Resident memory growth
+# comes from psutil when installed, else from /proc on Linux, else from the
+# peak size known to resource;
+# Python allocations are counted by tracemalloc, in separate runs.
+# Usage: python benchmarks/startupBench.py [--runs N] [--budget MS]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import payloads
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+# what the entry points import at load time
+STARTUP = """
+from radioBoss import LazyModule, metrics, profiler
+from radioBoss.configManager import addonConfig
+from radioBoss.constants import TrackDetails
+apiUtils = LazyModule("apiUtils")
+trackInfoDialog = LazyModule("trackInfoDialog")
+"""
+
+# paid once, by the first API call
+FIRST_CALL = """
+apiUtils.load()
+"""
+
+# what the entry points imported at load time before modules were made lazy
+EAGER = """
+from radioBoss import apiUtils, trackInfoDialog
+from radioBoss.configManager import addonConfig
+from radioBoss.constants import TrackDetails
+"""
+
+SCENARIOS = {
+	"startup": (STARTUP,),
+	"first call": (STARTUP, FIRST_CALL),
+	"eager": (EAGER,),
+}
+
+CHILD = """
+import sys, time
+sys.path[:0] = [{benchmarks!r}, {shared!r}]
+import nvdaStubs
+nvdaStubs.install()
+
+try:
+	import psutil
+	getRSS = lambda: psutil.Process().memory_info().rss
+except ImportError:
+	getRSS = None
+if getRSS is None and sys.platform.startswith("linux"):
+	import os
+	pageSize = os.sysconf("SC_PAGE_SIZE")
+	getRSS = lambda: int(open("/proc/self/statm").read().split()[1])*pageSize
+if getRSS is None:
+	try:
+		import resource
+		# peak resident size, good enough while imports only grow memory
+		scale = 1 if sys.platform == "darwin" else 1024
+		getRSS = lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*scale
+	except ImportError:
+		getRSS = lambda: None
+if {traced!r}:
+	import tracemalloc
+	tracemalloc.start()
+
+steps = {steps!r}
+before = set(sys.modules)
+rss = getRSS()
+start = time.perf_counter()
+namespace = {{}}
+for step in steps:
+	exec(step, namespace)
+elapsed = time.perf_counter()-start
+rss = getRSS()-rss if rss is not None else None
+allocated = tracemalloc.get_traced_memory()[0] if {traced!r} else None
+print(repr((elapsed*1000, rss, allocated, len(set(sys.modules)-before))))
+"""
+
+def runScenario(steps, traced):
+	code = CHILD.format(benchmarks=BENCHMARKS, shared=payloads.SHARED, steps=steps, traced=traced)
+	out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+	return eval(out.strip().splitlines()[-1])
+
+def median(values):
+	values = [value for value in values if value is not None]
+	return statistics.median(values) if values else None
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per scenario")
+	parser.add_argument("--budget", type=float, help="fail if the startup median exceeds these milliseconds")
+	parser.add_argument("--json", action="store_true", help="print results as JSON")
+	args = parser.parse_args()
+	results = {}
+	for name, steps in SCENARIOS.items():
+		# tracing allocations slows imports down and takes memory itself, so it gets runs of its own
+		samples = [runScenario(steps, False) for run in range(args.runs)]
+		tracedSamples = [runScenario(steps, True) for run in range(args.runs)]
+		rss = median(sample[1] for sample in samples)
+		results[name] = {
+			"ms": median(sample[0] for sample in samples),
+			"rssKiB": rss/1024 if rss is not None else None,
+			"allocatedKiB": median(sample[2] for sample in tracedSamples)/1024,
+			"modules": samples[-1][3],
+		}
+	if args.json:
+		print(json.dumps(results, indent=1))
+	else:
+		print("%-12s %10s %10s %14s %8s"%("scenario", "median ms", "RSS KiB", "allocated KiB", "modules"))
+		for name, res in results.items():
+			rss = "%10.1f"%res["rssKiB"] if res["rssKiB"] is not None else "%10s"%"n/a"
+			print("%-12s %10.2f %s %14.1f %8d"%(name, res["ms"], rss, res["allocatedKiB"], res["modules"]))
+	if args.budget is not None and results["startup"]["ms"] > args.budget:
+		print("startup over budget: %.2f ms > %.2f ms"%(results["startup"]["ms"], args.budget))
+		sys.exit(1)
+
+if __name__ == "__main__":
+	main()
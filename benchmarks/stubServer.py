@@ -0,0 +1,121 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS add-on benchmarks
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+# Stand-in for the RadioBOSS HTTP API, answering mic, playbackinfo, trackinfo
+# and getplaylist2 with synthetic payloads after a configurable delay.
+# The current track plays on in a loop, so positions and remaining times move.
+# Usage: python benchmarks/stubServer.py [--port N] [--latency MS] [--jitter MS] [--size NAME] [--rows N]
+
+import argparse
+import random
+import sys
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import payloads
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+	protocol_version = "HTTP/1.1"
+	# or delayed acknowledgements hold each answer body for tens of milliseconds
+	disable_nagle_algorithm = True
+
+	def do_GET(self):
+		query = parse_qs(urlsplit(self.path).query)
+		action = query.get("action", [""])[0]
+		body = self.server.answer(action, query)
+		self.server.wait()
+		if body is None:
+			self.send_response(400, "Unknown action")
+			body = b""
+		else:
+			self.send_response(200)
+		self.send_header("Content-Type", "text/xml; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format, *args):
+		pass
+
+
+class StubServer(ThreadingHTTPServer):
+
+	daemon_threads = True
+
+	def __init__(self, port=0, latency=0, jitter=0, size="typical", rows=500, playlistPos=10, mic=False):
+		super().__init__(("127.0.0.1", port), StubHandler)
+		# milliseconds
+		self.latency = latency
+		self.jitter = jitter
+		self.size = size
+		self.rows = rows
+		self.playlistPos = playlistPos
+		self.mic = mic
+		self.started = time.monotonic()
+		# answers not depending on time are built once
+		self.playlist = None
+		self.tracks = {}
+
+	@property
+	def port(self):
+		return self.server_address[1]
+
+	def wait(self):
+		delay = self.latency+random.uniform(-self.jitter, self.jitter)
+		if delay > 0:
+			time.sleep(delay/1000)
+
+	def answer(self, action, query):
+		if action == "mic":
+			return b"1" if self.mic else b"0"
+		if action == "playbackinfo":
+			return self.playbackInfo()
+		if action == "trackinfo":
+			try:
+				pos = int(query["pos"][0])
+			except (KeyError, ValueError):
+				return None
+			if pos not in self.tracks:
+				self.tracks[pos] = payloads.trackInfo(pos, self.size) if 0 < pos <= self.rows else b"<Info/>"
+			return self.tracks[pos]
+		if action == "getplaylist2":
+			if self.playlist is None:
+				self.playlist = payloads.playlist(self.rows, self.size)
+			return self.playlist
+		return None
+
+	def playbackInfo(self):
+		index = self.playlistPos
+		length = payloads.trackDuration(index)
+		pos = int((time.monotonic()-self.started)*1000)%length
+		playingTimeLeft = sum(payloads.trackDuration(i) for i in range(index, self.rows+1))-pos
+		return payloads.playbackInfo(self.size, index, pos, length, playingTimeLeft)
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--port", type=int, default=9000, help="0 picks a free one")
+	parser.add_argument("--latency", type=float, default=0, help="milliseconds added to each answer")
+	parser.add_argument("--jitter", type=float, default=0, help="milliseconds the latency varies by, either way")
+	parser.add_argument("--size", choices=payloads.SIZES, default="typical", help="track payload size")
+	parser.add_argument("--rows", type=int, default=500, help="playlist length")
+	parser.add_argument("--mic", action="store_true", help="report the mic as on")
+	args = parser.parse_args()
+	server = StubServer(args.port, args.latency, args.jitter, args.size, args.rows, mic=args.mic)
+	# the first line tells callers where to connect
+	print("listening on port %d"%server.port, flush=True)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,63 @@
+# -*- coding: UTF-8 -*-
+# RadioBOSS add-on benchmarks
+# Copyright (C) 2024 Alberto Buffolino
+# Released under GPL 2
+
+# Compares the streaming xmlParser with the former full ElementTree build
+# on playbackinfo payloads of growing size.
+# Usage: python benchmarks/xmlParserBench.py [--number N]
+
+import argparse
+import timeit
+import tracemalloc
+
+from xml.etree import ElementTree
+
+import payloads
+from radioBoss import xmlParser
+from radioBoss.constants import XPaths, TrackDetails
+
+DETAILS = tuple(TrackDetails)
+
+def etreeParse(info, tag, attrs=None):
+	# the former implementation, fed with decoded text as requests' .text did
+	parsedTag = ElementTree.fromstring(info.decode("UTF-8")).find(tag).attrib
+	if attrs is None:
+		return parsedTag
+	if isinstance(attrs, str):
+		return parsedTag.get(attrs)
+	return {attr: parsedTag.get(attr) for attr in attrs}
+
+CASES = (
+	("playback pos", (XPaths.PLAYBACK, "pos")),
+	("current track", (XPaths.CURRENT_TRACK, DETAILS)),
+	("next track", (XPaths.NEXT_TRACK, DETAILS)),
+)
+
+def measure(func, args, number):
+	best = min(timeit.repeat(lambda: func(*args), number=number, repeat=5))
+	tracemalloc.start()
+	func(*args)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return best/number*1e6, peak
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+	args = parser.parse_args()
+	print("%-8s %-14s %8s %12s %12s %10s %10s %8s"%(
+		"size", "query", "bytes", "etree us", "stream us", "etree KiB", "stream KiB", "speedup"
+	))
+	for size in payloads.SIZES:
+		info = payloads.playbackInfo(size)
+		for name, queryArgs in CASES:
+			assert etreeParse(info, *queryArgs) == xmlParser.parse(info, *queryArgs)
+			etreeTime, etreePeak = measure(etreeParse, (info, *queryArgs), args.number)
+			streamTime, streamPeak = measure(xmlParser.parse, (info, *queryArgs), args.number)
+			print("%-8s %-14s %8d %12.1f %12.1f %10.1f %10.1f %7.2fx"%(
+				size, name, len(info), etreeTime, streamTime, etreePeak/1024, streamPeak/1024, etreeTime/streamTime
+			))
+
+if __name__ == "__main__":
+	main()